@@ -1,37 +1,35 @@
 import os
-import re
-import sqlite3
-import threading
+import time
+import asyncio
 import discord
+import tempfile
 import datetime
 from discord.ext import commands
 from discord.ui import View, Button
-from collections import Counter
 from typing import Optional, List, Dict, Any
 from discord import TextChannel, Guild
-from flask import Flask
-from threading import Thread
 from discord import app_commands
 from dotenv import load_dotenv
 
 # Cargar las variables de entorno desde el archivo .env
+# (antes de importar los módulos del bot, que leen su configuración al importarse)
 load_dotenv()
 
-
-app = Flask("")
-
-@app.route("/")
-def home():
-    return "Bot activo ✅"
-
-def run():
-    app.run(host="0.0.0.0", port=8080)
-
-def keep_alive():
-    t = Thread(target=run, daemon=True)
-    t.start()
+from store import Balances  # noqa: E402
+from log_sink import LogSink  # noqa: E402
+from approvals import ACTIONS, make_custom_id, parse_custom_id  # noqa: E402
+from leaderboard import RefreshScheduler, page_hash, render_balance_pages  # noqa: E402
+from db import Database  # noqa: E402
+from datatool import export_balances  # noqa: E402
+from health import HealthServer  # noqa: E402
+from maintenance import Maintenance  # noqa: E402
+from guild_state import GuildRegistry  # noqa: E402
+from guild_config import CHANNEL_KEYS, ADMIN_ROLES_KEY, PRICES_KEY, GuildConfig  # noqa: E402
+from metrics import InstrumentedTree, discord_http_trace, registry as metrics  # noqa: E402
 
 # ------------------ CONFIG ------------------
+# Canales, roles admin y precios son los valores por defecto de cada guild; los
+# admins los cambian en caliente con /config (tabla guild_config, guild_config.py).
 TOKEN = os.getenv("DISCORD_TOKEN")
 APPROVAL_CHANNEL_ID = int(
     os.getenv("APPROVAL_CHANNEL_ID", "1423525053366009988"))
@@ -42,16 +40,40 @@ ADMIN_ROLE_IDS = [
     1398674257961029703, # Otro rol admin
 ]
 LOGS_CHANNEL_ID = os.getenv("LOGS_CHANNEL_ID", "1423525483298947223")
+# Servidor HTTP de salud (/healthz, /metrics) en el event loop del bot
+HEALTH_HOST = os.getenv("HEALTH_HOST", "0.0.0.0")
+HEALTH_PORT = int(os.getenv("HEALTH_PORT", "8080"))
+# Segundos durante los que se agrupan líneas de log en un mismo mensaje
+LOGS_FLUSH_INTERVAL = float(os.getenv("LOGS_FLUSH_INTERVAL", "2.0"))
+# Segundos que se esperan para agrupar varios cambios en un solo refresco de balances
+BALANCES_REFRESH_WINDOW = float(os.getenv("BALANCES_REFRESH_WINDOW", "2.0"))
 
 if BALANCES_CHANNEL_ID:
     BALANCES_CHANNEL_ID = int(BALANCES_CHANNEL_ID)
 if LOGS_CHANNEL_ID:
     LOGS_CHANNEL_ID = int(LOGS_CHANNEL_ID)
 
+# Cuántos guilds se inicializan a la vez en on_ready
+STARTUP_CONCURRENCY = int(os.getenv("STARTUP_CONCURRENCY", "5"))
+# Avisos (reacción + respuesta) en curso a la vez al resolver un lote con /lote
+BULK_NOTIFY_CONCURRENCY = int(os.getenv("BULK_NOTIFY_CONCURRENCY", "5"))
+REGEAR_CHANNEL_ID = int(os.getenv("REGEAR_CHANNEL_ID", "1398647955178917934"))
+# Guild donde se sincronizan los comandos slash
+SYNC_GUILD_ID = int(os.getenv("SYNC_GUILD_ID", "1398647954616619038"))
+
+# Sharding: SHARD_COUNT (o BOT_SHARDED=1 para que Discord lo decida) usa AutoShardedBot.
+# SHARD_IDS="0,1" reparte los shards entre varios procesos que comparten la base de datos.
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "0")) or None
+SHARD_IDS = [int(s) for s in os.getenv("SHARD_IDS", "").split(",") if s.strip()] or None
+BOT_SHARDED = os.getenv("BOT_SHARDED", "0") == "1" or SHARD_COUNT is not None or SHARD_IDS is not None
+if SHARD_IDS is not None and SHARD_COUNT is None:
+    print("❌ ERROR: SHARD_IDS requiere SHARD_COUNT (total de shards de todos los procesos).")
+    exit(1)
+
 COMMAND_PREFIX = "!"
 
 # ------------------ VALORES POR NÚMERO ------------------
-# Usamos claves tipo str porque message.content.split() y re.findall devuelven strings.
+# Claves tipo str por compatibilidad; el parser las convierte a una lista indexada por número.
 NUMBER_VALUES: Dict[str, int] = {
     "1": 925000,
     "2": 1037000,
@@ -85,201 +107,200 @@ NUMBER_VALUES: Dict[str, int] = {
 }
 NUMBER_LIST: List[str] = list(NUMBER_VALUES.keys())
 
+DEFAULT_CONFIG = GuildConfig(
+    approval_channel_id=APPROVAL_CHANNEL_ID,
+    balances_channel_id=BALANCES_CHANNEL_ID or None,
+    logs_channel_id=LOGS_CHANNEL_ID or None,
+    regear_channel_id=REGEAR_CHANNEL_ID,
+    admin_role_ids=ADMIN_ROLE_IDS,
+    number_values=NUMBER_VALUES,
+)
+
 # ------------------ BOT / INTENTS ------------------
 intents = discord.Intents.default()
 intents.message_content = True
 intents.members = True
-bot = commands.Bot(command_prefix="!", intents=intents)
 
 # ------------------ DATABASE SEGURA ------------------
-DB_PATH = os.getenv("DB_PATH", "balances.db")
-db_lock = threading.Lock()
-
-# Crear tabla si no existe
-with db_lock:
-    conn = sqlite3.connect(DB_PATH)
-    conn.execute("""
-        CREATE TABLE IF NOT EXISTS balances (
-            guild_id INTEGER NOT NULL,
-            user_id INTEGER NOT NULL,
-            balance INTEGER DEFAULT 0,
-            PRIMARY KEY (guild_id, user_id)
-        )
-    """)
-    conn.commit()
-    conn.close()
-
-
-def get_balance(guild_id: int, user_id: int) -> int:
-    """Devuelve el balance actual de un usuario, 0 si no existe."""
-    with db_lock:
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
-        cur = conn.execute(
-            "SELECT balance FROM balances WHERE guild_id = ? AND user_id = ?",
-            (guild_id, user_id)
-        )
-        row = cur.fetchone()
-        conn.close()
-    return int(row["balance"]) if row else 0
-
-
-def set_balance(guild_id: int, user_id: int, amount: int):
-    """Establece el balance exacto de un usuario (reemplaza lo anterior)."""
-    with db_lock:
-        conn = sqlite3.connect(DB_PATH)
-        conn.execute("""
-            INSERT INTO balances (guild_id, user_id, balance)
-            VALUES (?, ?, ?)
-            ON CONFLICT(guild_id, user_id) DO UPDATE SET balance = excluded.balance
-        """, (guild_id, user_id, amount))
-        conn.commit()
-        conn.close()
-
-
-def add_balance(guild_id: int, user_id: int, amount: int):
-    """Suma de manera atómica el balance, segura para concurrencia."""
-    if amount <= 0:
-        return
-    with db_lock:
-        conn = sqlite3.connect(DB_PATH)
-        conn.execute("""
-            INSERT INTO balances (guild_id, user_id, balance)
-            VALUES (?, ?, ?)
-            ON CONFLICT(guild_id, user_id) DO UPDATE SET balance = balance + excluded.balance
-        """, (guild_id, user_id, amount))
-        conn.commit()
-        conn.close()
-
-
-def remove_balance(guild_id: int, user_id: int, amount: int):
-    """Resta balance de manera atómica, no permite negativos."""
-    if amount <= 0:
-        return
-    with db_lock:
-        conn = sqlite3.connect(DB_PATH)
-        conn.execute("""
-            UPDATE balances
-            SET balance = MAX(balance - ?, 0)
-            WHERE guild_id = ? AND user_id = ?
-        """, (amount, guild_id, user_id))
-        conn.commit()
-        conn.close()
-
-
-def top_balances(guild_id: int, limit: int = 250):
-    """Devuelve lista de usuarios ordenada por balance descendente."""
-    with db_lock:
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
-        cur = conn.execute(
-            "SELECT user_id, balance FROM balances WHERE guild_id = ? ORDER BY balance DESC LIMIT ?",
-            (guild_id, limit)
-        )
-        rows = cur.fetchall()
-        conn.close()
-    return rows
+# Acceso asíncrono a balances: las consultas corren en el hilo de la base de
+# datos (store.py) sobre las conexiones persistentes en modo WAL de db.py.
+# Las lecturas salen de la caché en memoria; ver BALANCE_DURABILITY.
+balances = Balances()
+
+
+class RegearBot(commands.AutoShardedBot if BOT_SHARDED else commands.Bot):
+
+    async def setup_hook(self):
+        # Las colas de aprobación se cargan por guild (guild_states.queue), así
+        # cada proceso solo lee las solicitudes de los guilds de sus shards.
+        try:
+            await health_server.start()
+            print(f"🌐 Servidor de salud iniciado en http://{HEALTH_HOST}:{HEALTH_PORT}")
+        except Exception as e:
+            print("❌ No se pudo iniciar el servidor de salud:", e)
+        # Copias y mantenimiento de la base compartida: solo el proceso del shard 0
+        if SHARD_IDS is None or 0 in SHARD_IDS:
+            maintenance.start()
+
+    async def close(self):
+        # Enviar los logs en cola mientras la conexión sigue abierta
+        await log_sink.aclose()
+        await super().close()
+        await health_server.aclose()
+        await maintenance.aclose()
+        # Volcar los balances pendientes antes de que se detenga el event loop
+        await balances.aclose()
+
+
+# Cada comando slash y cada llamada a la API de Discord se miden (metrics.py)
+shard_options: Dict[str, Any] = {}
+if BOT_SHARDED:
+    shard_options = {"shard_count": SHARD_COUNT, "shard_ids": SHARD_IDS}
+bot = RegearBot(command_prefix="!", intents=intents,
+                tree_cls=InstrumentedTree, http_trace=discord_http_trace(), **shard_options)
+health_server = HealthServer(bot, balances, host=HEALTH_HOST, port=HEALTH_PORT)
+health_server.collector(metrics.render_prometheus)
+maintenance = Maintenance(balances)
+health_server.gauge("bot_backup_last_success_timestamp", "Hora de la última copia verificada (0 si aún no hay)",
+                    lambda: maintenance.last_backup_at)
+health_server.gauge("bot_backup_ok", "0 si la última copia no pasó la verificación",
+                    lambda: float(maintenance.last_ok))
 
 # ------------------ COLAS Y MENSAJES FIJOS ------------------
-approval_queue: List[Dict[str, Any]] = []
-approval_message: Optional[discord.Message] = None
-balances_messages: List[discord.Message] = []
+# Todo el estado va por guild (guild_state.py): cada guild lo atiende un solo
+# shard (y un solo proceso), así las cachés en memoria nunca se pisan entre procesos.
+# Las colas viven en SQLite (approvals.py) y se cargan la primera vez que se usan.
+guild_states = GuildRegistry(balances, DEFAULT_CONFIG)
+
+
+async def is_admin(member: Optional[discord.Member]) -> bool:
+    """True si el miembro tiene alguno de los roles admin configurados en su guild."""
+    if member is None:
+        return False
+    config = await guild_states.config(member.guild.id)
+    return any(config.is_admin_role(role.id) for role in member.roles)
 
 
 # ------------------ VIEW (Botones) ------------------
 class ApprovalView(View):
+    """Botones de una solicitud concreta: el custom_id lleva el id de la solicitud."""
 
-    def __init__(self):
+    def __init__(self, request_id: int):
         super().__init__(timeout=None)
         self.add_item(
             Button(style=discord.ButtonStyle.success,
                    label="Aprobar",
-                   custom_id="approve"))
+                   custom_id=make_custom_id("approve", request_id)))
         self.add_item(
             Button(style=discord.ButtonStyle.danger,
                    label="Rechazar",
-                   custom_id="reject"))
+                   custom_id=make_custom_id("reject", request_id)))
         self.add_item(
             Button(style=discord.ButtonStyle.secondary,
                    label="Pendiente",
-                   custom_id="pending"))
+                   custom_id=make_custom_id("pending", request_id)))
 
 
 # ------------------ LOGS ------------------
-async def send_log(guild: Guild, text: str):
-    if not LOGS_CHANNEL_ID:
+# Los logs se encolan y se envían agrupados en segundo plano (log_sink.py),
+# así ningún comando espera a la API de Discord por un log.
+log_sink = LogSink(flush_interval=LOGS_FLUSH_INTERVAL)
+
+health_server.gauge("bot_approval_queue_size", "Solicitudes de regear en cola",
+                    lambda: sum(len(s.queue) for s in guild_states))
+health_server.gauge("bot_guild_states", "Guilds con estado en memoria", lambda: len(guild_states))
+health_server.gauge("bot_shards", "Shards atendidos por este proceso", lambda: len(getattr(bot, "shards", {})) or 1)
+health_server.gauge("bot_log_lines_dropped", "Líneas de log descartadas por cola llena", lambda: log_sink.dropped)
+
+
+def send_log(guild: Guild, text: str):
+    logs_channel_id = guild_states.cached_config(guild.id).logs_channel_id
+    if not logs_channel_id:
         return
-    channel = guild.get_channel(LOGS_CHANNEL_ID)
+    channel = guild.get_channel(logs_channel_id)
     if isinstance(channel, TextChannel):
+        log_sink.put(channel, text)
+
+
+# ------------------ MENSAJES FIJOS / ACTUALIZAR ------------------
+# Los IDs de los mensajes fijos se guardan por guild (tabla pinned_messages) y se
+# piden directamente por ID; el historial del canal solo se recorre si faltan.
+async def fetch_pinned_messages(guild: Guild, kind: str,
+                                channel: TextChannel) -> Optional[List[discord.Message]]:
+    """Mensajes guardados para `kind`; None si no hay o alguno ya no existe."""
+    stored = await balances.run(Database.pinned_messages, guild.id, kind)
+    if not stored:
+        return None
+    messages = []
+    for channel_id, message_id in stored:
+        if channel_id != channel.id:
+            return None
         try:
-            await channel.send(text)
+            messages.append(await channel.fetch_message(message_id))
+        except discord.NotFound:
+            return None
         except Exception as e:
-            print("Error enviando log:", e)
+            print(f"Error recuperando mensaje fijo {message_id}:", e)
+            return None
+    return messages
+
+
+async def save_pinned_messages(guild: Guild, kind: str, channel: TextChannel,
+                               messages: List[discord.Message]):
+    try:
+        await balances.run(Database.save_pinned_messages, guild.id, kind, channel.id,
+                           [m.id for m in messages])
+    except Exception as e:
+        print(f"Error guardando mensajes fijos ({kind}):", e)
 
 
-# ------------------ MENSAJES FIJOS / ACTUALIZAR ------------------
 async def ensure_approval_message(
         guild: Optional[Guild]) -> Optional[discord.Message]:
-    global approval_message
     if guild is None:
         return None
-    channel = guild.get_channel(APPROVAL_CHANNEL_ID)
+    config = await guild_states.config(guild.id)
+    channel = guild.get_channel(config.approval_channel_id or 0)
     if not isinstance(channel, TextChannel):
         return None
 
+    stored = await fetch_pinned_messages(guild, "approval", channel)
+    if stored:
+        guild_states.get(guild.id).approval_message = stored[0]
+        return stored[0]
+
     try:
         async for msg in channel.history(limit=50):
             if msg.author == bot.user and (msg.embeds
                                            or msg.content.startswith("📥")):
-                approval_message = msg
-                return approval_message
+                guild_states.get(guild.id).approval_message = msg
+                await save_pinned_messages(guild, "approval", channel, [msg])
+                return msg
     except Exception:
         pass
 
     try:
         approval_message = await channel.send(
             "📥 Iniciando sistema de regear...")
+        guild_states.get(guild.id).approval_message = approval_message
+        await save_pinned_messages(guild, "approval", channel, [approval_message])
         return approval_message
     except Exception as e:
         print("No se pudo crear approval_message:", e)
         return None
 
 
-async def update_approval_message(guild: Optional[Guild]):
-    global approval_message
-    if guild is None:
-        return
-    channel = guild.get_channel(APPROVAL_CHANNEL_ID)
-    if not isinstance(channel, TextChannel):
-        return
-
-    if approval_message is None:
-        approval_message = await ensure_approval_message(guild)
-        if approval_message is None:
-            return
-
-    if not approval_queue:
-        embed = discord.Embed(title="🎉 Todos los regear han sido gestionados",
-                              description="No quedan solicitudes pendientes.",
-                              color=discord.Color.green())
-        try:
-            await approval_message.edit(embed=embed, view=None)
-        except Exception as e:
-            print("Error editando approval_message (vacío):", e)
-        return
-
-    current = approval_queue[0]
-    user_id = current.get("user_id")
-    numbers_counter: Counter = current.get("numbers_counter", Counter())
-    total_value: int = current.get("total_value", 0)
-    attachments = current.get("attachments", [])
+def build_request_embed(request: Dict[str, Any]) -> discord.Embed:
+    user_id = request.get("user_id")
+    numbers_counter: Dict[int, int] = request.get("numbers_counter", {})
+    total_value: int = request.get("total_value", 0)
+    attachments = request.get("attachments", [])
 
     numbers_text = ", ".join([
         f"{num} x{count}" for num, count in numbers_counter.items()
     ]) if numbers_counter else "Ninguno"
 
     embed = discord.Embed(
-        title="📥 Solicitud de Regear en Revisión",
+        title=f"📥 Solicitud de Regear en Revisión (#{request.get('id')})",
         description=
         f"**Jugador:** <@{user_id}>\n**Números:** {numbers_text}\n**Total:** {total_value:,} silver",
         color=discord.Color.blue())
@@ -297,14 +318,57 @@ async def update_approval_message(guild: Optional[Guild]):
                 embed.add_field(name=f"📸 Imagen {i}", value=url, inline=False)
             except Exception as e:
                 print("No se pudo añadir campo de imagen:", e)
+    return embed
+
+
+@metrics.timed("task")
+async def update_approval_message(guild: Optional[Guild]):
+    if guild is None:
+        return
+    config = await guild_states.config(guild.id)
+    channel = guild.get_channel(config.approval_channel_id or 0)
+    if not isinstance(channel, TextChannel):
+        return
+
+    state = guild_states.get(guild.id)
+    approval_queue = await state.queue.ready()
+    approval_message = state.approval_message
+    if approval_message is None:
+        approval_message = await ensure_approval_message(guild)
+        if approval_message is None:
+            return
+
+    if not approval_queue:
+        embed = discord.Embed(title="🎉 Todos los regear han sido gestionados",
+                              description="No quedan solicitudes pendientes.",
+                              color=discord.Color.green())
+        try:
+            await approval_message.edit(embed=embed, view=None)
+        except Exception as e:
+            print("Error editando approval_message (vacío):", e)
+        return
+
+    # El mensaje fijo muestra la primera solicitud que nadie está revisando
+    current = approval_queue.first_unclaimed()
+    if current is None:
+        embed = discord.Embed(
+            title="👀 Todas las solicitudes están en revisión",
+            description=f"{len(approval_queue)} solicitudes reclamadas por otros admins. Usa `/revisar` cuando se liberen.",
+            color=discord.Color.orange())
+        view = None
+    else:
+        embed = build_request_embed(current)
+        view = ApprovalView(current["id"])
+    embed.set_footer(text=f"En cola: {len(approval_queue)} · En revisión: {approval_queue.claimed_count()}")
 
     try:
-        await approval_message.edit(embed=embed, view=ApprovalView())
+        await approval_message.edit(embed=embed, view=view)
     except Exception as e:
         print("Error editando approval_message:", e)
         try:
-            approval_message = await channel.send(embed=embed,
-                                                  view=ApprovalView())
+            approval_message = await channel.send(embed=embed, view=view)
+            state.approval_message = approval_message
+            await save_pinned_messages(guild, "approval", channel, [approval_message])
         except Exception as e2:
             print("Segundo intento fallo al enviar approval_message:", e2)
 
@@ -312,85 +376,73 @@ async def update_approval_message(guild: Optional[Guild]):
 # ------------------ BALANCES FIJOS CON PÁGINAS ------------------
 async def ensure_balances_messages(guild: Optional[Guild]):
     """Reutiliza embeds existentes de balances al iniciar el bot"""
-    global balances_messages
-    if guild is None or not BALANCES_CHANNEL_ID:
+    if guild is None:
         return
-    channel = guild.get_channel(BALANCES_CHANNEL_ID)
+    config = await guild_states.config(guild.id)
+    channel = guild.get_channel(config.balances_channel_id or 0)
     if not isinstance(channel, TextChannel):
         return
 
-    try:
-        async for msg in channel.history(limit=50):
-            if msg.author == bot.user and msg.embeds:
-                balances_messages.append(msg)
-        balances_messages.sort(key=lambda m: m.id)  # mantener orden por ID
-    except Exception:
-        pass
+    found = await fetch_pinned_messages(guild, "balances", channel)
+    if found is None:
+        found = []
+        try:
+            async for msg in channel.history(limit=50):
+                if msg.author == bot.user and msg.embeds:
+                    found.append(msg)
+            found.sort(key=lambda m: m.id)  # mantener orden por ID
+        except Exception:
+            pass
+        await save_pinned_messages(guild, "balances", channel, found)
+
+    state = guild_states.get(guild.id)
+    for msg in found:
+        if msg.embeds:
+            embed = msg.embeds[0]
+            state.page_hashes[msg.id] = page_hash(embed.title or "", embed.description or "")
+    state.balances_messages = found
 
 
-async def update_balances_message(guild: Optional[Guild]):
-    global balances_messages
-    if guild is None or not BALANCES_CHANNEL_ID:
+@metrics.timed("task")
+async def update_balances_message(guild: Optional[Guild], force: bool = False):
+    """Renderiza las páginas de balances y solo edita las que cambiaron."""
+    if guild is None:
         return
-    channel = guild.get_channel(BALANCES_CHANNEL_ID)
+    config = await guild_states.config(guild.id)
+    channel = guild.get_channel(config.balances_channel_id or 0)
     if not isinstance(channel, TextChannel):
         return
+    state = guild_states.get(guild.id)
+    pages_messages = state.balances_messages
 
-    rows = top_balances(guild.id, limit=250)
-    if not rows:
-        description = "No hay datos aún."
-        if balances_messages:
-            try:
-                await balances_messages[0].edit(embed=discord.Embed(
-                    title="📊 Balances del Gremio",
-                    description=description,
-                    color=discord.Color.blurple()
-                ).set_footer(
-                    text=
-                    f"Solo visible para Admins – Última actualización {datetime.datetime.now().strftime('%H:%M:%S')}"
-                ))
-            except Exception:
-                pass
-        else:
-            try:
-                msg = await channel.send(embed=discord.Embed(
-                    title="📊 Balances del Gremio",
-                    description=description,
-                    color=discord.Color.blurple()
-                ).set_footer(
-                    text=
-                    f"Solo visible para Admins – Última actualización {datetime.datetime.now().strftime('%H:%M:%S')}"
-                ))
-                balances_messages.append(msg)
-            except Exception:
-                pass
-        return
-
-    page_size = 50
-    total_pages = (len(rows) + page_size - 1) // page_size
+    rows = await balances.top(guild.id, limit=250)
+    pages = render_balance_pages(rows)
+    total_pages = len(pages)
+    pages_changed = len(pages_messages) != total_pages
 
-    while len(balances_messages) < total_pages:
+    while len(pages_messages) < total_pages:
         try:
             msg = await channel.send("Cargando balances...")
-            balances_messages.append(msg)
-        except Exception:
-            pass
-    while len(balances_messages) > total_pages:
-        msg_to_remove = balances_messages.pop()
+            pages_messages.append(msg)
+        except Exception as e:
+            print("Error creando página de balances:", e)
+            break
+    while len(pages_messages) > total_pages:
+        msg_to_remove = pages_messages.pop()
+        state.page_hashes.pop(msg_to_remove.id, None)
         try:
             await msg_to_remove.delete()
         except Exception:
             pass
+    if pages_changed:
+        await save_pinned_messages(guild, "balances", channel, pages_messages)
 
-    for page_index in range(total_pages):
-        chunk = rows[page_index * page_size:(page_index + 1) * page_size]
-        lines = [
-            f"**{i + 1}.** <@{row['user_id']}> — {int(row['balance']):,} silver"
-            for i, row in enumerate(chunk, start=page_index * page_size)
-        ]
-        description = "\n".join(lines)
+    for (title, description), msg in zip(pages, pages_messages):
+        digest = page_hash(title, description)
+        if not force and state.page_hashes.get(msg.id) == digest:
+            continue
         embed = discord.Embed(
-            title=f"📊 Balances del Gremio (página {page_index + 1})",
+            title=title,
             description=description,
             color=discord.Color.blurple())
         embed.set_footer(
@@ -398,17 +450,49 @@ async def update_balances_message(guild: Optional[Guild]):
             f"Solo visible para Admins – Última actualización {datetime.datetime.now().strftime('%H:%M:%S')}"
         )
         try:
-            await balances_messages[page_index].edit(embed=embed)
+            await msg.edit(content=None, embed=embed)
+            state.page_hashes[msg.id] = digest
         except Exception as e:
             print("Error editando embed de balances:", e)
 
 
+# Agrupa las ráfagas de cambios (/split, aprobaciones...) en un solo refresco por guild
+balances_refresher = RefreshScheduler(update_balances_message, BALANCES_REFRESH_WINDOW)
+
+
+def schedule_balances_refresh(guild: Optional[Guild]):
+    # /top no se invalida aquí: su foto caduca sola tras TOP_SNAPSHOT_TTL segundos,
+    # así una ráfaga de cambios no obliga a cada vista a volver a consultar SQLite
+    if guild is not None:
+        balances_refresher.schedule(guild.id, guild)
+
+
 # ------------------ PROCESO DE APROBACION ------------------
+def format_numbers(numbers_counter: Dict[int, int]) -> str:
+    return ", ".join(f"{num} x{count}" for num, count in numbers_counter.items()) if numbers_counter else "Ninguno"
+
+
+async def notify_requester(guild: Guild, channel_id: int, message_id: int, emoji: str, text: str):
+    """Reacciona y responde al mensaje original de la solicitud, las dos cosas a la vez."""
+    channel = guild.get_channel(channel_id)
+    if not isinstance(channel, TextChannel):
+        return
+    # Con un PartialMessage no hace falta pedir el mensaje (fetch_message) antes
+    message = channel.get_partial_message(message_id)
+    results = await asyncio.gather(message.add_reaction(emoji), message.reply(text), return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception) and not isinstance(result, discord.NotFound):
+            print("Error tratando mensaje original:", result)
+
+
 async def process_approval(interaction: discord.Interaction,
-                           user_id: Optional[int], numbers_counter: Counter,
+                           user_id: Optional[int], numbers_counter: Dict[int, int],
                            total_value: int, status: str,
                            original_channel_id: Optional[int], attachments,
-                           original_message_id: Optional[int]):
+                           original_message_id: Optional[int],
+                           request_id: int) -> bool:
+    """Resuelve la solicitud y avisa; False si no se pudo guardar en la base de
+    datos (la solicitud sigue en cola y quien la sacó debe devolverla)."""
 
     guild = interaction.guild
     if guild is None or user_id is None or original_channel_id is None or original_message_id is None:
@@ -417,119 +501,170 @@ async def process_approval(interaction: discord.Interaction,
                 "❌ Error: servidor o datos incompletos.", ephemeral=True)
         except Exception:
             pass
-        return
+        return True
+
+    # Responder a Discord antes de cualquier otra llamada: el plazo de la interacción es de 3 s
+    try:
+        await interaction.response.defer(ephemeral=True, thinking=True)
+    except discord.HTTPException as e:
+        print("Error difiriendo la interacción:", e)
+
+    # El estado y el abono se confirman en la misma transacción, y solo si la
+    # solicitud seguía en cola en la base de datos (otro proceso pudo resolverla)
+    amount = total_value if status == "Aprobado" else 0
+    try:
+        applied = await balances.resolve_requests(
+            guild.id, [(request_id, user_id, amount, f"solicitud #{request_id}")], status,
+            actor_id=interaction.user.id)
+    except Exception as e:
+        print("Error resolviendo la solicitud:", e)
+        try:
+            await interaction.followup.send(
+                "❌ No se pudo guardar la solicitud, sigue en cola. Inténtalo de nuevo.", ephemeral=True)
+        except discord.HTTPException:
+            pass
+        return False
+    if not applied:
+        try:
+            await interaction.followup.send("❌ Esta solicitud ya fue procesada.", ephemeral=True)
+        except discord.HTTPException:
+            pass
+        await update_approval_message(guild)
+        return True
 
     member = guild.get_member(user_id)
     if status == "Aprobado":
-        add_balance(guild.id, user_id, total_value)
         emoji = "✅"
-        await send_log(
+        send_log(
             guild,
             f"✅ Aprobado: <@{user_id}> +{total_value:,} silver (números: {numbers_counter})"
         )
     elif status == "Rechazado":
         emoji = "❌"
-        await send_log(
+        send_log(
             guild, f"❌ Rechazado: <@{user_id}> (números: {numbers_counter})")
     else:
         emoji = "⏳"
-        await send_log(
+        send_log(
             guild, f"⏳ Pendiente: <@{user_id}> (números: {numbers_counter})")
 
-    numbers_text = ", ".join([
-        f"{num} x{count}" for num, count in numbers_counter.items()
-    ]) if numbers_counter else "Ninguno"
+    numbers_text = format_numbers(numbers_counter)
     mention = member.mention if member else f"<@{user_id}>"
 
-    try:
-        orig_channel = guild.get_channel(original_channel_id)
-        if isinstance(orig_channel, TextChannel):
-            try:
-                orig_msg = await orig_channel.fetch_message(original_message_id
-                                                            )
-                try:
-                    await orig_msg.add_reaction(emoji)
-                except Exception:
-                    pass
-                try:
-                    await orig_msg.reply(
-                        f"{mention} tu regear ha sido **{status}**.\n"
-                        f"Números: {numbers_text}\n"
-                        f"Total agregado: {total_value:,} silver")
-                except Exception:
-                    pass
-            except Exception:
-                pass
+    # El mensaje fijo pasa a la siguiente solicitud sin esperar a las notificaciones;
+    # el mensaje de balances se refresca agrupado (schedule_balances_refresh).
+    schedule_balances_refresh(guild)
+    results = await asyncio.gather(
+        update_approval_message(guild),
+        notify_requester(guild, original_channel_id, original_message_id, emoji,
+                         f"{mention} tu regear ha sido **{status}**.\n"
+                         f"Números: {numbers_text}\n"
+                         f"Total agregado: {total_value:,} silver"),
+        interaction.followup.send(f"✅ Solicitud de {mention} procesada: {status}", ephemeral=True),
+        return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception):
+            print("Error en efectos de la aprobación:", result)
+    return True
 
-    except Exception as e:
-        print("Error tratando mensaje original:", e)
 
-    try:
-        await interaction.response.send_message(
-            f"✅ Solicitud de {mention} procesada: {status}", ephemeral=True)
-    except Exception:
-        pass
+# ------------------ EVENTOS ------------------
+startup_done = False
 
-    if approval_queue:
-        approval_queue.pop(0)
 
-    await update_approval_message(guild)
-    await update_balances_message(guild)
+async def init_guild(guild: Guild, semaphore: asyncio.Semaphore):
+    """Prepara los mensajes fijos de un guild; varios guilds corren a la vez."""
+    async with semaphore:
+        start = time.perf_counter()
+        try:
+            await guild_states.queue(guild.id)
+            await ensure_approval_message(guild)
+            await update_approval_message(guild)
+            await ensure_balances_messages(guild)
+            await update_balances_message(guild)
+        except Exception as e:
+            print(f"Error inicializando guild {guild.id}:", e)
+        guild_states.get(guild.id).startup_seconds = time.perf_counter() - start
 
 
-# ------------------ EVENTOS ------------------
 @bot.event
 async def on_ready():
+    global startup_done
     print(f"✅ Bot conectado como {bot.user}")
 
-    for g in bot.guilds:
-        try:
-            await ensure_approval_message(g)
-            await update_approval_message(g)
-            await ensure_balances_messages(g)
-            await update_balances_message(g)
-        except Exception as e:
-            print("Error inicializando guild:", e)
-
-    # Sincronizar comandos slash solo en tu servidor
+    # on_ready se repite en cada reconexión; la inicialización solo hace falta una vez
+    if startup_done:
+        print("🔁 Reconectado, se omite la inicialización de guilds")
+        return
+    startup_done = True
+
+    semaphore = asyncio.Semaphore(STARTUP_CONCURRENCY)
+    start = time.perf_counter()
+    await asyncio.gather(*(init_guild(g, semaphore) for g in bot.guilds))
+    initialized = [s for s in guild_states if s.startup_seconds is not None]
+    if initialized:
+        slowest = max(initialized, key=lambda s: s.startup_seconds)
+        print(f"🚀 {len(initialized)} guilds inicializados en {time.perf_counter() - start:.2f}s "
+              f"(más lento: {slowest.guild_id}, {slowest.startup_seconds:.2f}s)")
+        print(f"📥 Solicitudes en cola recuperadas: {sum(len(s.queue) for s in guild_states)}")
+
+    # Sincronizar comandos slash solo en tu servidor (una vez, desde el proceso del shard 0)
+    shard_ids = getattr(bot, "shard_ids", None)
+    if shard_ids is not None and 0 not in shard_ids:
+        return
     try:
-        guild_obj = discord.Object(id=1398647954616619038)
+        guild_obj = discord.Object(id=SYNC_GUILD_ID)
         synced = await bot.tree.sync(guild=guild_obj)
         print(f"🌐 Comandos sincronizados: {len(synced)}")
     except Exception as e:
         print("❌ Error sincronizando comandos:", e)
+
+
+@bot.event
+async def on_guild_join(guild: Guild):
+    await init_guild(guild, asyncio.Semaphore(1))
+
+
 @bot.event
+async def on_guild_remove(guild: Guild):
+    # Liberar todo lo que el bot guardaba en memoria para este guild
+    balances_refresher.cancel(guild.id)
+    guild_states.evict(guild.id)
+    try:
+        await balances.forget(guild.id)
+    except Exception as e:
+        print(f"Error liberando balances del guild {guild.id}:", e)
+    print(f"👋 Guild {guild.id} abandonado, estado liberado ({len(guild_states)} activos)")
+
+
+@bot.event
+@metrics.timed("event")
 async def on_message(message: discord.Message):
     if message.author.bot:
         return
 
-    # Solo atender mensajes en el canal de regear
-    REGEAR_CHANNEL_ID = 1398647955178917934
-    if message.channel.id != REGEAR_CHANNEL_ID:
+    # Solo atender mensajes en el canal de regear del guild
+    config = await guild_states.config(message.guild.id) if message.guild else None
+    if config is None or message.channel.id != config.regear_channel_id:
         # ⚠️ IMPORTANTE: no procesamos nada más, solo comandos
         await bot.process_commands(message)
         return
 
-    # Extraer números 1..29 como strings
-    numbers = re.findall(r'\b(?:[1-9]|1[0-9]|2[0-9])\b', message.content)
-    numbers_counter: Counter = Counter(numbers)
-    total_value = sum(NUMBER_VALUES.get(num, 0) * count for num, count in numbers_counter.items())
+    # Extraer números de rol (admite cantidad: "7x3") con los precios del guild
+    numbers_counter, total_value = config.parser.parse(message.content)
 
     # Revisar adjuntos
     attachments_list = list(message.attachments)
 
     # Solo meter en cola si hay números válidos o imágenes en el canal correcto
     if total_value > 0 or attachments_list:
-        approval_queue.append({
-            "user_id": message.author.id,
-            "numbers_counter": numbers_counter,
-            "total_value": total_value,
-            "original_channel_id": message.channel.id,
-            "attachments": attachments_list,
-            "original_message_id": message.id
-        })
-
-        if len(approval_queue) == 1:
+        approval_queue = await guild_states.queue(message.guild.id)
+        request = await approval_queue.push(
+            message.guild.id, message.author.id, numbers_counter,
+            total_value, message.channel.id, message.id, attachments_list)
+
+        # Solo hace falta redibujar si el mensaje fijo estaba sin solicitud libre
+        if approval_queue.first_unclaimed() is request:
             await update_approval_message(message.guild)
 
     # Siempre dejar pasar los comandos
@@ -537,11 +672,16 @@ async def on_message(message: discord.Message):
 
 
 @bot.event
+@metrics.timed("event")
 async def on_interaction(interaction: discord.Interaction):
     if interaction.type != discord.InteractionType.component or not interaction.data:
         return
 
-    custom_id = interaction.data.get("custom_id")
+    parsed = parse_custom_id(interaction.data.get("custom_id"))
+    if parsed is None:
+        return
+    action, request_id = parsed
+
     guild = interaction.guild
     if guild is None:
         try:
@@ -551,14 +691,14 @@ async def on_interaction(interaction: discord.Interaction):
         return
 
     member = guild.get_member(interaction.user.id)
-    member_roles_ids = [int(r.id) for r in member.roles] if member else []
-    if not any(rid in ADMIN_ROLE_IDS for rid in member_roles_ids):
+    if not await is_admin(member):
         try:
             await interaction.response.send_message("❌ No tienes permisos.", ephemeral=True)
         except Exception:
             pass
         return
 
+    approval_queue = await guild_states.queue(guild.id)
     if not approval_queue:
         try:
             await interaction.response.send_message("❌ No hay solicitudes en cola.", ephemeral=True)
@@ -566,24 +706,208 @@ async def on_interaction(interaction: discord.Interaction):
             pass
         return
 
-    current_req = approval_queue[0]
+    # Botones antiguos sin id actúan sobre la primera solicitud libre
+    if request_id is None:
+        head = approval_queue.first_unclaimed()
+        request_id = head["id"] if head else None
+
+    # Sacar la solicitud de la cola: solo un admin gana aunque hagan clic a la vez.
+    # En la base de datos sigue "En cola" hasta que process_approval confirme el estado.
+    current_req = approval_queue.take(request_id, interaction.user.id) if request_id is not None else None
+    if current_req is None:
+        holder = approval_queue.claimed_by(request_id) if request_id is not None else None
+        text = (f"❌ Esta solicitud la está revisando <@{holder}>." if holder
+                else "❌ Esta solicitud ya fue procesada.")
+        try:
+            await interaction.response.send_message(text, ephemeral=True)
+        except Exception:
+            pass
+        return
+
     user_id = current_req.get("user_id")
-    numbers_counter = current_req.get("numbers_counter", Counter())
+    numbers_counter = current_req.get("numbers_counter", {})
     total_value = current_req.get("total_value", 0)
     original_channel_id = current_req.get("original_channel_id")
     attachments = current_req.get("attachments", [])
     original_message_id = current_req.get("original_message_id")
 
-    if custom_id == "approve":
-        await process_approval(interaction, user_id, numbers_counter, total_value,
-                               "Aprobado", original_channel_id, attachments, original_message_id)
-    elif custom_id == "reject":
-        await process_approval(interaction, user_id, Counter(), 0,
-                               "Rechazado", original_channel_id, attachments, original_message_id)
-    elif custom_id == "pending":
-        await process_approval(interaction, user_id, Counter(), 0,
-                               "Pendiente", original_channel_id, attachments, original_message_id)
+    status = ACTIONS[action]
+    if status != "Aprobado":
+        numbers_counter, total_value = {}, 0
+    if not await process_approval(interaction, user_id, numbers_counter, total_value,
+                                  status, original_channel_id, attachments, original_message_id,
+                                  request_id):
+        approval_queue.put_back([current_req])
+        await update_approval_message(guild)
+
+
+# ------------------ revisar ------------------
+@bot.tree.command(name="revisar", description="Tomar la siguiente solicitud de regear libre (Admin)")
+async def revisar(interaction: discord.Interaction):
+    if interaction.guild is None:
+        await interaction.response.send_message("❌ Este comando solo puede usarse en un servidor.", ephemeral=True)
+        return
+
+    executor = interaction.guild.get_member(interaction.user.id)
+    if not await is_admin(executor):
+        await interaction.response.send_message("❌ No tienes permisos.", ephemeral=True)
+        return
+
+    # Cada admin reclama una solicitud distinta, así varios revisan en paralelo
+    approval_queue = await guild_states.queue(interaction.guild.id)
+    request = approval_queue.next_for(interaction.user.id)
+    if request is None:
+        await interaction.response.send_message("✅ No hay solicitudes libres en cola.", ephemeral=True)
+        return
 
+    await interaction.response.send_message(embed=build_request_embed(request),
+                                            view=ApprovalView(request["id"]), ephemeral=True)
+    # El mensaje fijo pasa a la siguiente solicitud libre
+    await update_approval_message(interaction.guild)
+
+
+# ------------------ lote ------------------
+BULK_MAX = 25  # opciones por menú de selección en Discord
+BULK_EMOJIS = {"Aprobado": "✅", "Rechazado": "❌"}
+
+
+async def process_bulk(interaction: discord.Interaction, requests: List[Dict[str, Any]],
+                       status: str) -> List[Dict[str, Any]]:
+    """Resuelve varias solicitudes ya sacadas de la cola: balances y estados en
+    una sola transacción, avisos con concurrencia acotada y un solo redibujado
+    de los mensajes fijos. Devuelve las que se resolvieron (las que otro
+    proceso ya había resuelto se omiten sin abono). Si la transacción falla, la
+    excepción sale antes de cualquier aviso y las solicitudes siguen en cola."""
+    guild = interaction.guild
+    rows = [(r["id"], r["user_id"], r["total_value"] if status == "Aprobado" else 0, f"solicitud #{r['id']} (lote)")
+            for r in requests]
+    applied = set(await balances.resolve_requests(guild.id, rows, status, actor_id=interaction.user.id))
+    requests = [r for r in requests if r["id"] in applied]
+
+    emoji = BULK_EMOJIS[status]
+    for r in requests:
+        total = r["total_value"] if status == "Aprobado" else 0
+        send_log(guild, f"{emoji} {status} (lote): <@{r['user_id']}> +{total:,} silver "
+                        f"(números: {r['numbers_counter']})")
+    schedule_balances_refresh(guild)
+
+    semaphore = asyncio.Semaphore(BULK_NOTIFY_CONCURRENCY)
+
+    async def notify(request: Dict[str, Any]):
+        async with semaphore:
+            total = request["total_value"] if status == "Aprobado" else 0
+            await notify_requester(guild, request["original_channel_id"], request["original_message_id"], emoji,
+                                   f"<@{request['user_id']}> tu regear ha sido **{status}**.\n"
+                                   f"Números: {format_numbers(request['numbers_counter'])}\n"
+                                   f"Total agregado: {total:,} silver")
+
+    results = await asyncio.gather(update_approval_message(guild), *(notify(r) for r in requests),
+                                   return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception):
+            print("Error en efectos del lote:", result)
+    return requests
+
+
+class BulkView(View):
+    """Menú con las primeras solicitudes libres para aprobar o rechazar varias de una vez."""
+
+    def __init__(self, guild: Guild, owner_id: int, requests: List[Dict[str, Any]]):
+        super().__init__(timeout=300)
+        self.guild = guild
+        self.owner_id = owner_id
+        self.selected: List[int] = []
+        options = []
+        for r in requests:
+            member = guild.get_member(r["user_id"])
+            name = member.display_name if member else str(r["user_id"])
+            options.append(discord.SelectOption(label=f"#{r['id']} · {name} · {r['total_value']:,} silver"[:100],
+                                                value=str(r["id"]),
+                                                description=format_numbers(r["numbers_counter"])[:100]))
+        self.select = discord.ui.Select(placeholder="Elige las solicitudes", min_values=1,
+                                        max_values=len(options), options=options, row=0)
+        self.select.callback = self.on_select
+        self.add_item(self.select)
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return interaction.user.id == self.owner_id
+
+    async def on_select(self, interaction: discord.Interaction):
+        self.selected = [int(v) for v in self.select.values]
+        await interaction.response.defer()
+
+    async def resolve(self, interaction: discord.Interaction, status: str):
+        if not self.selected:
+            await interaction.response.send_message("❌ Elige al menos una solicitud.", ephemeral=True)
+            return
+        approval_queue = await guild_states.queue(self.guild.id)
+        requests = approval_queue.take_many(self.selected, interaction.user.id)
+        if not requests:
+            await interaction.response.edit_message(
+                content="❌ Esas solicitudes ya fueron procesadas o las revisa otro admin.", embed=None, view=None)
+            return
+
+        self.stop()
+        await interaction.response.edit_message(content=f"⏳ Procesando {len(requests)} solicitudes...",
+                                                embed=None, view=None)
+        try:
+            requests = await process_bulk(interaction, requests, status)
+        except Exception as e:
+            print("Error resolviendo el lote:", e)
+            approval_queue.put_back(requests)
+            await update_approval_message(self.guild)
+            try:
+                await interaction.edit_original_response(
+                    content=f"❌ No se pudo guardar el lote ({e}); las {len(requests)} solicitudes siguen en cola.")
+            except discord.HTTPException as error:
+                print("Error editando respuesta del lote:", error)
+            return
+        skipped = len(self.selected) - len(requests)
+        text = f"{BULK_EMOJIS[status]} {len(requests)} solicitudes: {status}"
+        if status == "Aprobado":
+            text += f" ({sum(r['total_value'] for r in requests):,} silver)"
+        if skipped:
+            text += f"\n⚠️ {skipped} omitidas (ya procesadas o en revisión por otro admin)."
+        try:
+            await interaction.edit_original_response(content=text)
+        except discord.HTTPException as e:
+            print("Error editando respuesta del lote:", e)
+
+    @discord.ui.button(label="Aprobar seleccionadas", style=discord.ButtonStyle.success, row=1)
+    async def approve(self, interaction: discord.Interaction, button: Button):
+        await self.resolve(interaction, "Aprobado")
+
+    @discord.ui.button(label="Rechazar seleccionadas", style=discord.ButtonStyle.danger, row=1)
+    async def reject(self, interaction: discord.Interaction, button: Button):
+        await self.resolve(interaction, "Rechazado")
+
+
+@bot.tree.command(name="lote", description="Aprobar o rechazar varias solicitudes de regear a la vez (Admin)")
+async def lote(interaction: discord.Interaction):
+    if interaction.guild is None:
+        await interaction.response.send_message("❌ Este comando solo puede usarse en un servidor.", ephemeral=True)
+        return
+
+    executor = interaction.guild.get_member(interaction.user.id)
+    if not await is_admin(executor):
+        await interaction.response.send_message("❌ No tienes permisos.", ephemeral=True)
+        return
+
+    approval_queue = await guild_states.queue(interaction.guild.id)
+    requests = approval_queue.unclaimed(BULK_MAX)
+    if not requests:
+        await interaction.response.send_message("✅ No hay solicitudes libres en cola.", ephemeral=True)
+        return
+
+    total = sum(r["total_value"] for r in requests)
+    embed = discord.Embed(
+        title="📦 Resolver solicitudes en lote",
+        description=f"Primeras {len(requests)} solicitudes libres ({total:,} silver en total).\n"
+                    f"Elige cuáles aprobar o rechazar; las demás siguen en cola.",
+        color=discord.Color.blue())
+    embed.set_footer(text=f"En cola: {len(approval_queue)} · En revisión: {approval_queue.claimed_count()}")
+    await interaction.response.send_message(embed=embed, view=BulkView(interaction.guild, interaction.user.id, requests),
+                                            ephemeral=True)
 
 
 # ------------------ COMANDOS SLASH ------------------
@@ -608,29 +932,13 @@ async def addbal(interaction: discord.Interaction, member: discord.Member, amoun
         return
 
     # Verificar rol de administrador
-    member_roles_ids = [r.id for r in executor.roles]
-    if not any(rid in ADMIN_ROLE_IDS for rid in member_roles_ids):
+    if not await is_admin(executor):
         await interaction.response.send_message("❌ No tienes permisos.", ephemeral=True)
         return
 
     # Añadir balance de manera atómica y obtener balance actualizado
-    with db_lock:
-        conn = sqlite3.connect(DB_PATH)
-        cur = conn.cursor()
-        cur.execute(
-            "INSERT INTO balances (guild_id, user_id, balance) VALUES (?, ?, ?) "
-            "ON CONFLICT(guild_id, user_id) DO UPDATE SET balance = balance + ?",
-            (interaction.guild.id, member.id, amount, amount)
-        )
-        conn.commit()
-        cur.execute(
-            "SELECT balance FROM balances WHERE guild_id = ? AND user_id = ?",
-            (interaction.guild.id, member.id)
-        )
-        row = cur.fetchone()
-        conn.close()
-
-    new_balance = int(row[0])
+    new_balance = await balances.add(interaction.guild.id, member.id, amount,
+                                     kind="addbal", actor_id=executor.id)
 
     # Enviar mensaje de confirmación
     await interaction.response.send_message(
@@ -638,8 +946,8 @@ async def addbal(interaction: discord.Interaction, member: discord.Member, amoun
     )
 
     # Enviar log y actualizar balances
-    await send_log(interaction.guild, f"ADMIN {executor} añadió {amount:,} silver a <@{member.id}>")
-    await update_balances_message(interaction.guild)
+    send_log(interaction.guild, f"ADMIN {executor} añadió {amount:,} silver a <@{member.id}>")
+    schedule_balances_refresh(interaction.guild)
 
 # ------------------ balremove ------------------
 # ------------------ balremove (corregido) ------------------
@@ -663,35 +971,13 @@ async def balremove(interaction: discord.Interaction, member: discord.Member, am
         return
 
     # Verificar rol de administrador
-    member_roles_ids = [r.id for r in executor.roles]
-    if not any(rid in ADMIN_ROLE_IDS for rid in member_roles_ids):
+    if not await is_admin(executor):
         await interaction.response.send_message("❌ No tienes permisos.", ephemeral=True)
         return
 
     # Remover balance de manera segura y obtener balance actualizado
-    with db_lock:
-        conn = sqlite3.connect(DB_PATH)
-        cur = conn.cursor()
-
-        # Obtener balance actual
-        cur.execute(
-            "SELECT balance FROM balances WHERE guild_id = ? AND user_id = ?",
-            (interaction.guild.id, member.id)
-        )
-        row = cur.fetchone()
-        current_balance = int(row[0]) if row else 0
-
-        # Calcular nuevo balance
-        new_balance = max(current_balance - amount, 0)
-
-        # Actualizar balance
-        cur.execute(
-            "INSERT INTO balances (guild_id, user_id, balance) VALUES (?, ?, ?) "
-            "ON CONFLICT(guild_id, user_id) DO UPDATE SET balance = ?",
-            (interaction.guild.id, member.id, new_balance, new_balance)
-        )
-        conn.commit()
-        conn.close()
+    new_balance = await balances.remove(interaction.guild.id, member.id, amount,
+                                        kind="balremove", actor_id=executor.id)
 
     # Enviar mensaje de confirmación
     await interaction.response.send_message(
@@ -699,8 +985,8 @@ async def balremove(interaction: discord.Interaction, member: discord.Member, am
     )
 
     # Enviar log y actualizar balances
-    await send_log(interaction.guild, f"ADMIN {executor} removió {amount:,} silver de <@{member.id}>")
-    await update_balances_message(interaction.guild)
+    send_log(interaction.guild, f"ADMIN {executor} removió {amount:,} silver de <@{member.id}>")
+    schedule_balances_refresh(interaction.guild)
 
 # ------------------ balance ------------------
 @bot.tree.command(name="balance", description="Ver tu balance o el de otro jugador con ranking")
@@ -717,16 +1003,10 @@ async def balance(interaction: discord.Interaction, member: Optional[discord.Mem
             return
 
     user_id = member.id
-    balance_val = get_balance(interaction.guild.id, user_id)
-
-    # Obtener ranking global usando top_balances (con lock)
-    all_balances = top_balances(interaction.guild.id, limit=1000)  # límite grande
-    ranking = None
-    for idx, row in enumerate(all_balances, start=1):
-        if row["user_id"] == user_id:
-            ranking = idx
-            break
+    balance_val = await balances.get(interaction.guild.id, user_id)
 
+    # Ranking exacto con una consulta indexada (guild_id, balance)
+    ranking = await balances.rank(interaction.guild.id, user_id)
     if ranking is None:
         ranking = "N/A"
 
@@ -741,23 +1021,140 @@ async def balance(interaction: discord.Interaction, member: Optional[discord.Mem
 
     await interaction.response.send_message(embed=embed)
 
-# ------------------ top ------------------
-@bot.tree.command(name="top", description="Ver el top 10 de balances")
-async def top(interaction: discord.Interaction):
+# ------------------ historial ------------------
+HISTORY_PAGE_SIZE = 10
+LEDGER_LABELS = {
+    "regear": "Regear aprobado",
+    "addbal": "Añadido por admin",
+    "balremove": "Removido por admin",
+    "pagar": "Pago",
+    "transferir": "Transferencia",
+    "split": "Split",
+}
+
+
+class HistoryView(View):
+    """Páginas del ledger de un jugador; cada página se pide por cursor (id)."""
+
+    def __init__(self, guild_id: int, member: discord.Member, owner_id: int):
+        super().__init__(timeout=300)
+        self.guild_id = guild_id
+        self.member = member
+        self.owner_id = owner_id
+        self.cursors: List[Optional[int]] = [None]  # before_id de cada página visitada
+        self.next_cursor: Optional[int] = None
+
+    async def render(self) -> discord.Embed:
+        rows = await balances.history(self.guild_id, self.member.id,
+                                      self.cursors[-1], HISTORY_PAGE_SIZE + 1)
+        has_next = len(rows) > HISTORY_PAGE_SIZE
+        rows = rows[:HISTORY_PAGE_SIZE]
+        self.next_cursor = rows[-1]["id"] if has_next else None
+        self.prev_page.disabled = len(self.cursors) == 1
+        self.next_page.disabled = self.next_cursor is None
+
+        lines = []
+        for row in rows:
+            label = LEDGER_LABELS.get(row["kind"], row["kind"])
+            if row["note"]:
+                label += f" ({row['note']})"
+            lines.append(f"<t:{row['created_at']}:g> **{row['delta']:+,}** · {label} → {row['balance']:,}")
+        embed = discord.Embed(
+            title=f"📜 Historial de {self.member.display_name}",
+            description="\n".join(lines) if lines else "Sin movimientos registrados.",
+            color=discord.Color.dark_gold())
+        embed.set_footer(text=f"Página {len(self.cursors)}")
+        return embed
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return interaction.user.id == self.owner_id
+
+    @discord.ui.button(label="◀ Anterior", style=discord.ButtonStyle.secondary)
+    async def prev_page(self, interaction: discord.Interaction, button: Button):
+        if len(self.cursors) > 1:
+            self.cursors.pop()
+        await interaction.response.edit_message(embed=await self.render(), view=self)
+
+    @discord.ui.button(label="Siguiente ▶", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: Button):
+        if self.next_cursor is not None:
+            self.cursors.append(self.next_cursor)
+        await interaction.response.edit_message(embed=await self.render(), view=self)
+
+
+@bot.tree.command(name="historial", description="Ver los movimientos de balance de un jugador")
+@app_commands.describe(member="Jugador (opcional)")
+async def historial(interaction: discord.Interaction, member: Optional[discord.Member] = None):
     if interaction.guild is None:
         await interaction.response.send_message("❌ Este comando solo puede usarse en un servidor.", ephemeral=True)
         return
 
-    rows = top_balances(interaction.guild.id, limit=10)
-    if not rows:
-        await interaction.response.send_message("🏆 No hay jugadores con balance todavía.")
+    if member is None:
+        member = interaction.guild.get_member(interaction.user.id)
+        if member is None:
+            await interaction.response.send_message("❌ No se pudo encontrar tu información en el servidor.", ephemeral=True)
+            return
+
+    view = HistoryView(interaction.guild.id, member, interaction.user.id)
+    await interaction.response.send_message(embed=await view.render(), view=view, ephemeral=True)
+
+# ------------------ top ------------------
+TOP_PAGE_SIZE = 10
+
+
+class TopView(View):
+    """Ranking del servidor por páginas; cada página se pide con el cursor
+    (balance, user_id) de la anterior a la foto compartida del guild."""
+
+    def __init__(self, guild: Guild, owner_id: int):
+        super().__init__(timeout=300)
+        self.guild = guild
+        self.owner_id = owner_id
+        self.cursors: List[Optional[tuple]] = [None]  # cursor de cada página visitada
+        self.next_cursor: Optional[tuple] = None
+
+    async def render(self) -> discord.Embed:
+        snapshot = guild_states.get(self.guild.id).top
+        rows = await snapshot.page(self.cursors[-1], TOP_PAGE_SIZE + 1)
+        has_next = len(rows) > TOP_PAGE_SIZE
+        rows = rows[:TOP_PAGE_SIZE]
+        self.next_cursor = (rows[-1]["balance"], rows[-1]["user_id"]) if has_next else None
+        self.prev_page.disabled = len(self.cursors) == 1
+        self.next_page.disabled = self.next_cursor is None
+
+        start = (len(self.cursors) - 1) * TOP_PAGE_SIZE
+        lines = [f"{i}. <@{r['user_id']}>: {int(r['balance']):,} silver" for i, r in enumerate(rows, start=start + 1)]
+        embed = discord.Embed(
+            title="🏆 Top jugadores",
+            description="\n".join(lines) if lines else "No hay jugadores con balance todavía.",
+            color=discord.Color.gold())
+        embed.set_footer(text=f"Página {len(self.cursors)}")
+        return embed
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return interaction.user.id == self.owner_id
+
+    @discord.ui.button(label="◀ Anterior", style=discord.ButtonStyle.secondary)
+    async def prev_page(self, interaction: discord.Interaction, button: Button):
+        if len(self.cursors) > 1:
+            self.cursors.pop()
+        await interaction.response.edit_message(embed=await self.render(), view=self)
+
+    @discord.ui.button(label="Siguiente ▶", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: Button):
+        if self.next_cursor is not None:
+            self.cursors.append(self.next_cursor)
+        await interaction.response.edit_message(embed=await self.render(), view=self)
+
+
+@bot.tree.command(name="top", description="Ver el ranking de balances")
+async def top(interaction: discord.Interaction):
+    if interaction.guild is None:
+        await interaction.response.send_message("❌ Este comando solo puede usarse en un servidor.", ephemeral=True)
         return
 
-    msg = "\n".join([
-        f"{i+1}. <@{r['user_id']}>: {int(r['balance']):,} silver"
-        for i, r in enumerate(rows)
-    ])
-    await interaction.response.send_message(f"🏆 Top 10 jugadores:\n{msg}")
+    view = TopView(interaction.guild, interaction.user.id)
+    await interaction.response.send_message(embed=await view.render(), view=view)
 
 # ------------------ pagar ------------------
 @bot.tree.command(name="pagar", description="Pagar a un jugador y dejar su balance en 0")
@@ -773,24 +1170,21 @@ async def pagar(interaction: discord.Interaction, member: discord.Member):
         await interaction.response.send_message("❌ No se pudo identificar tu usuario en el servidor.", ephemeral=True)
         return
 
-    # Obtener lista de roles del ejecutor
-    member_roles_ids = [r.id for r in executor.roles]
-
     # Verificar roles de administrador (varios permitidos)
-    if not any(rid in ADMIN_ROLE_IDS for rid in member_roles_ids):
+    if not await is_admin(executor):
         await interaction.response.send_message("❌ No tienes permisos.", ephemeral=True)
         return
 
     # Obtener balance, pagar y resetear
-    total = get_balance(interaction.guild.id, member.id)
-    set_balance(interaction.guild.id, member.id, 0)
+    total = await balances.get(interaction.guild.id, member.id)
+    await balances.set(interaction.guild.id, member.id, 0, kind="pagar", actor_id=executor.id)
     await interaction.response.send_message(
         f"✅ Se pagó `{total:,} silver` a {member.mention}. Ahora su balance es 0."
     )
 
     # Pasar guild seguro
-    await send_log(interaction.guild, f"ADMIN {executor} pagó {total:,} silver a <@{member.id}>")
-    await update_balances_message(interaction.guild)
+    send_log(interaction.guild, f"ADMIN {executor} pagó {total:,} silver a <@{member.id}>")
+    schedule_balances_refresh(interaction.guild)
 
 # ------------------ transferir ------------------
 @bot.tree.command(name="transferir", description="Transferir silver a otro jugador")
@@ -804,23 +1198,23 @@ async def transferir(interaction: discord.Interaction, member: discord.Member, a
         await interaction.response.send_message("❌ La cantidad debe ser mayor a 0.", ephemeral=True)
         return
 
-    if get_balance(interaction.guild.id, interaction.user.id) < amount:
+    # Débito condicional y abono en una sola transacción (sin carrera entre comprobar y debitar)
+    result = await balances.transfer(interaction.guild.id, interaction.user.id, member.id, amount)
+    if result is None:
         await interaction.response.send_message("❌ No tienes suficiente balance para transferir.", ephemeral=True)
         return
-
-    remove_balance(interaction.guild.id, interaction.user.id, amount)
-    add_balance(interaction.guild.id, member.id, amount)
+    sender_balance, receiver_balance = result
 
     await interaction.response.send_message(
         f"✅ {interaction.user.mention} transfirió `{amount:,} silver` a {member.mention}.\n"
-        f"Tu nuevo balance: `{get_balance(interaction.guild.id, interaction.user.id):,} silver`\n"
-        f"Balance de {member.mention}: `{get_balance(interaction.guild.id, member.id):,} silver`"
+        f"Tu nuevo balance: `{sender_balance:,} silver`\n"
+        f"Balance de {member.mention}: `{receiver_balance:,} silver`"
     )
 
 
     # Pasamos guild seguro
-    await send_log(interaction.guild, f"{interaction.user} transfirió {amount:,} silver a <@{member.id}>")
-    await update_balances_message(interaction.guild)
+    send_log(interaction.guild, f"{interaction.user} transfirió {amount:,} silver a <@{member.id}>")
+    schedule_balances_refresh(interaction.guild)
 
 
 # ------------------ split ------------------
@@ -866,9 +1260,11 @@ async def split(interaction: discord.Interaction,
     neto = total - impuesto_calc - reparacion + silver_liquido
     por_jugador = neto // jugadores_count
 
-    # Repartir silver
-    for m in miembros:
-        add_balance(interaction.guild.id, m.id, por_jugador)
+    # Repartir silver a todos en una sola transacción
+    if por_jugador > 0:
+        await balances.add_many(interaction.guild.id, [(m.id, por_jugador) for m in miembros],
+                                kind="split", actor_id=interaction.user.id,
+                                note=f"split de {total:,} entre {jugadores_count}")
 
     # Embed principal con totales
     embed_principal = discord.Embed(title="⚔️ Loot Split", color=discord.Color.gold())
@@ -911,9 +1307,9 @@ async def split(interaction: discord.Interaction,
         await interaction.followup.send(embed=embed)
 
     # Log y actualización de balances
-    await send_log(interaction.guild,
-                   f"{interaction.user} hizo split: total {total:,}, impuesto {impuesto}%, reparación {reparacion:,}, líquido {silver_liquido:,}, jugadores {jugadores_count}")
-    await update_balances_message(interaction.guild)
+    send_log(interaction.guild,
+             f"{interaction.user} hizo split: total {total:,}, impuesto {impuesto}%, reparación {reparacion:,}, líquido {silver_liquido:,}, jugadores {jugadores_count}")
+    schedule_balances_refresh(interaction.guild)
 
 # ------------------ updatebalances ------------------
 @bot.tree.command(name="updatebalances", description="Actualizar lista de balances")
@@ -929,21 +1325,198 @@ async def updatebalances(interaction: discord.Interaction):
         await interaction.response.send_message("❌ No se pudo verificar tu rol.", ephemeral=True)
         return
 
-    # Obtener roles del usuario
-    member_roles_ids = [r.id for r in member.roles]
-
     # Verificar si tiene alguno de los roles admin
-    if not any(rid in ADMIN_ROLE_IDS for rid in member_roles_ids):
+    if not await is_admin(member):
         await interaction.response.send_message("❌ No tienes permisos.", ephemeral=True)
         return
 
     # Ejecutar actualización
-    await update_balances_message(interaction.guild)
+    await update_balances_message(interaction.guild, force=True)
     try:
         await interaction.response.send_message("✅ Lista de balances actualizada correctamente.", ephemeral=True)
     except Exception:
         pass
 
+# ------------------ stats ------------------
+STATS_FAMILIES = {"command": "Comandos", "event": "Eventos", "task": "Mensajes fijos",
+                  "db": "SQLite", "discord": "API de Discord"}
+
+
+@bot.tree.command(name="stats", description="Latencias p50/p95/p99 de la última hora (Admins)")
+async def stats(interaction: discord.Interaction):
+    if interaction.guild is None:
+        await interaction.response.send_message("❌ Este comando solo puede usarse en un servidor.", ephemeral=True)
+        return
+
+    member = interaction.guild.get_member(interaction.user.id)
+    if not await is_admin(member):
+        await interaction.response.send_message("❌ No tienes permisos.", ephemeral=True)
+        return
+
+    rows = metrics.percentiles()
+    embed = discord.Embed(title="📊 Latencias de la última hora",
+                          description="p50 / p95 / p99 en milisegundos (muestras)",
+                          color=discord.Color.blurple())
+    for family, label in STATS_FAMILIES.items():
+        # Las 10 series más lentas (por p95) de cada familia
+        family_rows = sorted((r for r in rows if r[0] == family), key=lambda r: r[4], reverse=True)[:10]
+        if not family_rows:
+            continue
+        lines = [f"`{name[:40]}` {p50 * 1000:.0f} / {p95 * 1000:.0f} / {p99 * 1000:.0f} ({count})"
+                 for _, name, count, p50, p95, p99 in family_rows]
+        embed.add_field(name=label, value="\n".join(lines)[:1024], inline=False)
+    if not embed.fields:
+        embed.description = "Todavía no hay mediciones."
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+# ------------------ exportar ------------------
+@bot.tree.command(name="exportar", description="Descargar los balances del servidor en CSV o JSON Lines (Admins)")
+@app_commands.describe(formato="csv (por defecto) o jsonl")
+@app_commands.choices(formato=[app_commands.Choice(name="CSV", value="csv"),
+                               app_commands.Choice(name="JSON Lines", value="jsonl")])
+async def exportar(interaction: discord.Interaction, formato: str = "csv"):
+    if interaction.guild is None:
+        await interaction.response.send_message("❌ Este comando solo puede usarse en un servidor.", ephemeral=True)
+        return
+
+    member = interaction.guild.get_member(interaction.user.id)
+    if not await is_admin(member):
+        await interaction.response.send_message("❌ No tienes permisos.", ephemeral=True)
+        return
+
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    # Los cambios en memoria tienen que estar en disco antes de leer la tabla
+    await balances.flush()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, f"balances_{interaction.guild.id}.{formato}")
+        count = await balances.run(export_balances, path, interaction.guild.id, formato)
+        if os.path.getsize(path) > interaction.guild.filesize_limit:
+            await interaction.followup.send(
+                f"❌ El archivo ({count:,} filas) supera el límite de Discord; usa `python datatool.py export`.",
+                ephemeral=True)
+            return
+        await interaction.followup.send(f"📤 {count:,} balances exportados.", file=discord.File(path),
+                                        ephemeral=True)
+
+# ------------------ config ------------------
+CHANNEL_LABELS = {"approval_channel_id": "Aprobación", "balances_channel_id": "Balances",
+                  "logs_channel_id": "Logs", "regear_channel_id": "Regear"}
+CONFIG_LABELS = dict(CHANNEL_LABELS, **{ADMIN_ROLES_KEY: "Roles admin", PRICES_KEY: "Precios"})
+
+config_group = app_commands.Group(name="config", description="Configuración del bot en este servidor (Admins)",
+                                  guild_only=True)
+
+
+async def can_configure(interaction: discord.Interaction) -> bool:
+    member = interaction.guild.get_member(interaction.user.id) if interaction.guild else None
+    # Los administradores del servidor siempre pueden, así nadie queda bloqueado al cambiar los roles
+    if member is not None and (member.guild_permissions.administrator or await is_admin(member)):
+        return True
+    await interaction.response.send_message("❌ No tienes permisos.", ephemeral=True)
+    return False
+
+
+async def refresh_pinned_channel(guild: Guild, key: str):
+    """Tras cambiar un canal, vuelve a colocar el mensaje fijo correspondiente."""
+    state = guild_states.get(guild.id)
+    if key == "approval_channel_id":
+        state.approval_message = None
+        await update_approval_message(guild)
+    elif key == "balances_channel_id":
+        state.balances_messages = []
+        state.page_hashes.clear()
+        await ensure_balances_messages(guild)
+        await update_balances_message(guild, force=True)
+
+
+@config_group.command(name="ver", description="Ver la configuración actual del servidor")
+async def config_ver(interaction: discord.Interaction):
+    if not await can_configure(interaction):
+        return
+    config = await guild_states.config(interaction.guild.id)
+    embed = discord.Embed(title="⚙️ Configuración del servidor", color=discord.Color.dark_grey())
+    for key, label in CHANNEL_LABELS.items():
+        channel_id = getattr(config, key)
+        embed.add_field(name=label, value=f"<#{channel_id}>" if channel_id else "—", inline=True)
+    roles = " ".join(f"<@&{rid}>" for rid in sorted(config.admin_role_ids)) or "—"
+    embed.add_field(name="Roles admin", value=roles[:1024], inline=False)
+    prices = ", ".join(f"`{n}`: {v:,}" for n, v in sorted(config.number_values.items())) or "—"
+    embed.add_field(name="Precios", value=prices[:1024], inline=False)
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+
+@config_group.command(name="canal", description="Cambiar un canal del bot")
+@app_commands.describe(tipo="Qué canal cambiar", canal="Canal nuevo")
+@app_commands.choices(tipo=[app_commands.Choice(name=label, value=key) for key, label in CHANNEL_LABELS.items()])
+async def config_canal(interaction: discord.Interaction, tipo: app_commands.Choice[str], canal: discord.TextChannel):
+    if not await can_configure(interaction):
+        return
+    await guild_states.set_config(interaction.guild.id, tipo.value, canal.id)
+    await interaction.response.send_message(f"✅ Canal de {tipo.name}: {canal.mention}", ephemeral=True)
+    send_log(interaction.guild, f"⚙️ {interaction.user} cambió el canal de {tipo.name} a {canal.mention}")
+    await refresh_pinned_channel(interaction.guild, tipo.value)
+
+
+@config_group.command(name="rol_admin", description="Añadir o quitar un rol de administrador del bot")
+@app_commands.describe(accion="Añadir o quitar", rol="Rol")
+@app_commands.choices(accion=[app_commands.Choice(name="Añadir", value="add"),
+                              app_commands.Choice(name="Quitar", value="remove")])
+async def config_rol_admin(interaction: discord.Interaction, accion: app_commands.Choice[str], rol: discord.Role):
+    if not await can_configure(interaction):
+        return
+    config = await guild_states.config(interaction.guild.id)
+    roles = set(config.admin_role_ids)
+    if accion.value == "add":
+        roles.add(rol.id)
+    else:
+        roles.discard(rol.id)
+    await guild_states.set_config(interaction.guild.id, ADMIN_ROLES_KEY, sorted(roles))
+    await interaction.response.send_message(f"✅ Roles admin: {len(roles)} ({accion.name.lower()} {rol.mention})",
+                                            ephemeral=True)
+    send_log(interaction.guild, f"⚙️ {interaction.user} {accion.name.lower()} rol admin {rol.mention}")
+
+
+@config_group.command(name="precio", description="Cambiar el precio de un número de regear (0 lo elimina)")
+@app_commands.describe(numero="Número de rol", valor="Silver que vale (0 para quitarlo)")
+async def config_precio(interaction: discord.Interaction, numero: app_commands.Range[int, 1, 999],
+                        valor: app_commands.Range[int, 0, None]):
+    if not await can_configure(interaction):
+        return
+    config = await guild_states.config(interaction.guild.id)
+    prices = dict(config.number_values)
+    if valor:
+        prices[numero] = valor
+    else:
+        prices.pop(numero, None)
+    await guild_states.set_config(interaction.guild.id, PRICES_KEY, {str(k): v for k, v in sorted(prices.items())})
+    text = f"`{numero}` = {valor:,} silver" if valor else f"`{numero}` eliminado"
+    await interaction.response.send_message(f"✅ Precio actualizado: {text}", ephemeral=True)
+    send_log(interaction.guild, f"⚙️ {interaction.user} cambió el precio: {text}")
+
+
+@config_group.command(name="restablecer", description="Volver al valor por defecto de una opción")
+@app_commands.describe(clave="Opción a restablecer")
+@app_commands.choices(clave=[app_commands.Choice(name=label, value=key) for key, label in CONFIG_LABELS.items()])
+async def config_restablecer(interaction: discord.Interaction, clave: app_commands.Choice[str]):
+    if not await can_configure(interaction):
+        return
+    await guild_states.set_config(interaction.guild.id, clave.value, None)
+    await interaction.response.send_message(f"✅ {clave.name} vuelve al valor por defecto.", ephemeral=True)
+    send_log(interaction.guild, f"⚙️ {interaction.user} restableció {clave.name}")
+    if clave.value in CHANNEL_KEYS:
+        await refresh_pinned_channel(interaction.guild, clave.value)
+
+
+@config_group.command(name="recargar", description="Releer la configuración desde la base de datos")
+async def config_recargar(interaction: discord.Interaction):
+    if not await can_configure(interaction):
+        return
+    await guild_states.reload_config(interaction.guild.id)
+    await interaction.response.send_message("✅ Configuración recargada.", ephemeral=True)
+
+
+bot.tree.add_command(config_group)
+
 # IDs de los desarrolladores
 DESARROLLADORES_IDS = [682425081300779058, 466932448937377792]
 
@@ -980,10 +1553,12 @@ async def helpbot(interaction: discord.Interaction):
     embed.add_field(
         name="⚔️ Sistema de Solicitudes de Regear",
         value=(
-            "- Envía mensaje con números (del `1` al `29`) y/o imágenes → entra en cola de aprobación.\n"
+            "- Envía mensaje con números (del `1` al `29`, o `7x3` para repetir) y/o imágenes → entra en cola de aprobación.\n"
             "- El canal de aprobación tiene un **embed fijo** que se actualiza con la solicitud actual.\n"
             "- El embed muestra números (que son roles en excel), total y las imágenes.\n"
             "- Botones de **Aprobar / Rechazar / Pendiente**.\n"
+            "- Con `/revisar` cada admin toma una solicitud distinta para revisar en paralelo.\n"
+            "- Con `/lote` se aprueban o rechazan varias solicitudes de una vez.\n"
             "- Al procesar:\n"
             "   • Balance actualizado si es aprobado.\n"
             "   • Reacción automática en mensaje original: ✅ aprobado, ❌ rechazado, ⏳ pendiente.\n"
@@ -998,10 +1573,14 @@ async def helpbot(interaction: discord.Interaction):
             "__Admins:__\n"
             "`/addbal @jugador cantidad`\n"
             "`/balremove @jugador cantidad`\n"
-            "`/pagar @jugador`\n\n"
+            "`/pagar @jugador`\n"
+            "`/stats` (latencias del bot)\n"
+            "`/exportar` (balances en CSV)\n"
+            "`/config` (canales, roles admin y precios)\n\n"
             "__Todos:__\n"
             "`/balance` o `/bal`\n"
             "`/top`\n"
+            "`/historial [@jugador]`\n"
             "`/transferir @jugador cantidad`"
         ),
         inline=False
@@ -1052,6 +1631,4 @@ if TOKEN is None:
     exit(1)
 
 if __name__ == "__main__":
-    keep_alive()      # arranca el servidor HTTP en segundo plano
-    print("🌐 Servidor keep_alive iniciado en http://0.0.0.0:8080")
-    bot.run(TOKEN)    # arranca el bot (bloquea el hilo principal)
+    bot.run(TOKEN)    # arranca el bot y el servidor de salud (bloquea el hilo principal)
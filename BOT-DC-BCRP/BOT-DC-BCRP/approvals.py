@@ -0,0 +1,199 @@
+import asyncio
+import json
+import time
+from collections import deque
+from itertools import islice
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from db import Database
+from store import Balances
+
+# Segundos que un admin retiene una solicitud abierta con /revisar
+CLAIM_TIMEOUT = 300
+
+# Botones: "regear:<acción>:<id>"; los ids viejos sin solicitud actúan sobre la cabeza
+ACTIONS = {"approve": "Aprobado", "reject": "Rechazado", "pending": "Pendiente"}
+CUSTOM_ID_PREFIX = "regear"
+
+
+def make_custom_id(action: str, request_id: int) -> str:
+    return f"{CUSTOM_ID_PREFIX}:{action}:{request_id}"
+
+
+def parse_custom_id(custom_id: Optional[str]) -> Optional[Tuple[str, Optional[int]]]:
+    """Devuelve (acción, id de solicitud) o None si el botón no es de regear."""
+    if custom_id in ACTIONS:
+        return custom_id, None
+    parts = (custom_id or "").split(":")
+    if len(parts) == 3 and parts[0] == CUSTOM_ID_PREFIX and parts[1] in ACTIONS and parts[2].isdigit():
+        return parts[1], int(parts[2])
+    return None
+
+
+class ApprovalQueue:
+    """Cola de solicitudes de regear persistida en la tabla approval_queue.
+
+    La tabla es la fuente de verdad (sobrevive a reinicios); el deque en
+    memoria da acceso O(1) a la cabeza y `_by_id` a cualquier solicitud. Cada
+    solicitud es un dict con las mismas claves que usa el resto del bot más
+    su `id` en la tabla.
+
+    Varios admins revisan en paralelo: cada uno reclama (`claim`) una
+    solicitud distinta y solo quien la saca con `take` la procesa.
+
+    Con `guild_id` la cola solo contiene las solicitudes de ese servidor (una
+    cola por guild, cargada cuando el shard que lo atiende la necesita).
+    """
+
+    def __init__(self, store: Balances, guild_id: Optional[int] = None):
+        self._store = store
+        self.guild_id = guild_id
+        self._items: Deque[Dict[str, Any]] = deque()
+        self._by_id: Dict[int, Dict[str, Any]] = {}
+        self._claims: Dict[int, Tuple[int, float]] = {}  # request_id -> (admin_id, vence)
+        self._loader: Optional[asyncio.Future] = None
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return (item for item in self._items if item["id"] in self._by_id)
+
+    def head(self) -> Optional[Dict[str, Any]]:
+        """Primera solicitud en cola; descarta en O(1) las ya sacadas con `take`."""
+        while self._items and self._items[0]["id"] not in self._by_id:
+            self._items.popleft()
+        return self._items[0] if self._items else None
+
+    def get(self, request_id: int) -> Optional[Dict[str, Any]]:
+        return self._by_id.get(request_id)
+
+    @staticmethod
+    def _from_row(row) -> Dict[str, Any]:
+        return {
+            "id": row["id"],
+            "guild_id": row["guild_id"],
+            "user_id": row["user_id"],
+            "numbers_counter": {int(k): v for k, v in json.loads(row["numbers"]).items()},
+            "total_value": row["total_value"],
+            "original_channel_id": row["channel_id"],
+            "attachments": json.loads(row["attachments"]),
+            "original_message_id": row["message_id"],
+        }
+
+    async def load(self):
+        """Recarga desde la base de datos las solicitudes aún sin resolver."""
+        rows = await self._store.run(Database.queued_requests, self.guild_id)
+        self._items = deque(self._from_row(r) for r in rows)
+        self._by_id = {item["id"]: item for item in self._items}
+        self._claims.clear()
+
+    async def ready(self) -> "ApprovalQueue":
+        """Carga la cola la primera vez que se usa; las llamadas concurrentes esperan la misma carga."""
+        if self._loader is None:
+            self._loader = asyncio.ensure_future(self.load())
+        try:
+            await asyncio.shield(self._loader)
+        except Exception:
+            self._loader = None
+            raise
+        return self
+
+    async def push(self, guild_id: int, user_id: int, numbers_counter: Dict[int, int], total_value: int,
+                   channel_id: int, message_id: int, attachments: List[Any]) -> Dict[str, Any]:
+        """Persiste la solicitud y la añade al final de la cola."""
+        urls = [att.url if hasattr(att, "url") else str(att) for att in attachments]
+        request_id = await self._store.run(
+            Database.enqueue_request, guild_id, user_id, json.dumps(dict(numbers_counter)),
+            total_value, channel_id, message_id, json.dumps(urls))
+        item = {
+            "id": request_id,
+            "guild_id": guild_id,
+            "user_id": user_id,
+            "numbers_counter": numbers_counter,
+            "total_value": total_value,
+            "original_channel_id": channel_id,
+            "attachments": urls,
+            "original_message_id": message_id,
+        }
+        self._items.append(item)
+        self._by_id[request_id] = item
+        return item
+
+    # ------------------ RECLAMOS ------------------
+    def claimed_by(self, request_id: int) -> Optional[int]:
+        """Admin que tiene reclamada la solicitud (si el reclamo no venció)."""
+        claim = self._claims.get(request_id)
+        if claim is None:
+            return None
+        if claim[1] < time.monotonic():
+            del self._claims[request_id]
+            return None
+        return claim[0]
+
+    def claim(self, request_id: int, admin_id: int) -> bool:
+        """Reserva la solicitud para `admin_id`; False si otro admin la tiene."""
+        if request_id not in self._by_id:
+            return False
+        holder = self.claimed_by(request_id)
+        if holder is not None and holder != admin_id:
+            return False
+        self._claims[request_id] = (admin_id, time.monotonic() + CLAIM_TIMEOUT)
+        return True
+
+    def next_for(self, admin_id: int) -> Optional[Dict[str, Any]]:
+        """Solicitud que ya revisa `admin_id` o la primera libre, reclamándola."""
+        first_free = None
+        for item in self:
+            holder = self.claimed_by(item["id"])
+            if holder == admin_id:
+                return item
+            if holder is None and first_free is None:
+                first_free = item
+        if first_free is not None:
+            self.claim(first_free["id"], admin_id)
+        return first_free
+
+    def first_unclaimed(self) -> Optional[Dict[str, Any]]:
+        return next((item for item in self if self.claimed_by(item["id"]) is None), None)
+
+    def unclaimed(self, limit: int) -> List[Dict[str, Any]]:
+        """Hasta `limit` solicitudes libres, en orden de llegada."""
+        return list(islice((item for item in self if self.claimed_by(item["id"]) is None), limit))
+
+    def claimed_count(self) -> int:
+        return sum(1 for rid in list(self._claims) if rid in self._by_id and self.claimed_by(rid) is not None)
+
+    def take(self, request_id: int, admin_id: int) -> Optional[Dict[str, Any]]:
+        """Saca la solicitud para procesarla; None si ya la sacó otro o la
+        reclamó otro admin. Al no ceder el event loop, solo un clic gana.
+
+        La fila sigue "En cola" en la base de datos hasta que la resuelva
+        Balances.resolve_requests, así un reinicio a mitad de proceso no pierde
+        nada; esa transacción es la que impide el doble abono entre procesos.
+        """
+        if not self.claim(request_id, admin_id):
+            return None
+        self._claims.pop(request_id, None)
+        item = self._by_id.pop(request_id)
+        self.head()  # poda la cabeza si era esta
+        return item
+
+    def take_many(self, request_ids: Iterable[int], admin_id: int) -> List[Dict[str, Any]]:
+        """Saca varias solicitudes a la vez; omite las que ya sacó o reclamó otro admin."""
+        taken = (self.take(request_id, admin_id) for request_id in request_ids)
+        return [item for item in taken if item is not None]
+
+    def put_back(self, items: Iterable[Dict[str, Any]]):
+        """Devuelve a su lugar en la cola (orden de id) solicitudes sacadas con
+        `take` que no se pudieron resolver, sin reclamo."""
+        queued = {item["id"] for item in self._items}
+        missing = []
+        for item in items:
+            self._by_id[item["id"]] = item
+            self._claims.pop(item["id"], None)
+            if item["id"] not in queued:
+                missing.append(item)
+        if missing:
+            # `head` pudo haberlas podado del deque
+            self._items = deque(sorted([*self._items, *missing], key=lambda item: item["id"]))
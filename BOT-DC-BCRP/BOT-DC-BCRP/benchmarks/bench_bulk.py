@@ -0,0 +1,68 @@
+"""Throughput de /split: abono por jugador vs. abono en lote en una transacción.
+
+    python benchmarks/bench_bulk.py [--rounds 20]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_db import LegacyStore  # noqa: E402
+from db import Database  # noqa: E402
+from store import Balances  # noqa: E402
+
+GUILD_ID = 1398647954616619038
+SIZES = (10, 100, 1000)
+
+
+def timed(fn, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / rounds
+
+
+async def timed_async(fn, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        await fn()
+    return (time.perf_counter() - start) / rounds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'jugadores':>10}{'método':>32}{'ms/split':>12}{'abonos/s':>14}")
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy = LegacyStore(os.path.join(tmp, "legacy.db"))
+        db = Database(os.path.join(tmp, "bulk.db"))
+        store = Balances(Database(os.path.join(tmp, "store.db")))
+
+        for size in SIZES:
+            players = list(range(size))
+            rounds = max(args.rounds * 10 // size, 2)
+            results = {
+                "add_balance por jugador (antes)": timed(
+                    lambda: [legacy.add_balance(GUILD_ID, uid, 1000) for uid in players], rounds),
+                "add_balance pool por jugador": timed(
+                    lambda: [db.add_balance(GUILD_ID, uid, 1000) for uid in players], rounds),
+                "Database.add_balances": timed(
+                    lambda: db.add_balances(GUILD_ID, [(uid, 1000) for uid in players]), rounds),
+                "Balances.add_many (strict)": asyncio.run(timed_async(
+                    lambda: store.add_many(GUILD_ID, [(uid, 1000) for uid in players]), rounds)),
+            }
+            for name, seconds in results.items():
+                print(f"{size:>10}{name:>32}{seconds * 1000:>12,.2f}{size / seconds:>14,.0f}")
+
+        store.close()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Benchmark antes/después de los helpers de balances.
+
+"antes" reproduce los helpers originales de Bot.py (una conexión, un commit
+y un close por llamada); "después" usa el pool persistente de db.py.
+
+    python benchmarks/bench_db.py [--ops 2000]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import Database  # noqa: E402
+
+GUILD_ID = 1398647954616619038
+USERS = 500
+
+
+# ------------------ HELPERS ORIGINALES ------------------
+class LegacyStore:
+    """Copia literal del acceso a datos anterior (conexión por llamada)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        conn = sqlite3.connect(path)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS balances (
+                guild_id INTEGER NOT NULL,
+                user_id INTEGER NOT NULL,
+                balance INTEGER DEFAULT 0,
+                PRIMARY KEY (guild_id, user_id)
+            )
+        """)
+        conn.commit()
+        conn.close()
+
+    def get_balance(self, guild_id, user_id):
+        with self.lock:
+            conn = sqlite3.connect(self.path)
+            row = conn.execute(
+                "SELECT balance FROM balances WHERE guild_id = ? AND user_id = ?",
+                (guild_id, user_id)).fetchone()
+            conn.close()
+        return int(row[0]) if row else 0
+
+    def set_balance(self, guild_id, user_id, amount):
+        with self.lock:
+            conn = sqlite3.connect(self.path)
+            conn.execute("""
+                INSERT INTO balances (guild_id, user_id, balance)
+                VALUES (?, ?, ?)
+                ON CONFLICT(guild_id, user_id) DO UPDATE SET balance = excluded.balance
+            """, (guild_id, user_id, amount))
+            conn.commit()
+            conn.close()
+
+    def add_balance(self, guild_id, user_id, amount):
+        with self.lock:
+            conn = sqlite3.connect(self.path)
+            conn.execute("""
+                INSERT INTO balances (guild_id, user_id, balance)
+                VALUES (?, ?, ?)
+                ON CONFLICT(guild_id, user_id) DO UPDATE SET balance = balance + excluded.balance
+            """, (guild_id, user_id, amount))
+            conn.commit()
+            conn.close()
+
+    def remove_balance(self, guild_id, user_id, amount):
+        with self.lock:
+            conn = sqlite3.connect(self.path)
+            conn.execute("""
+                UPDATE balances
+                SET balance = MAX(balance - ?, 0)
+                WHERE guild_id = ? AND user_id = ?
+            """, (amount, guild_id, user_id))
+            conn.commit()
+            conn.close()
+
+    def top_balances(self, guild_id, limit=250):
+        with self.lock:
+            conn = sqlite3.connect(self.path)
+            rows = conn.execute(
+                "SELECT user_id, balance FROM balances WHERE guild_id = ? ORDER BY balance DESC LIMIT ?",
+                (guild_id, limit)).fetchall()
+            conn.close()
+        return rows
+
+
+# ------------------ MEDICIÓN ------------------
+def ops_per_sec(fn, ops: int) -> float:
+    start = time.perf_counter()
+    for i in range(ops):
+        fn(i)
+    return ops / (time.perf_counter() - start)
+
+
+def run(store, ops: int):
+    for uid in range(USERS):
+        store.set_balance(GUILD_ID, uid, 1_000_000)
+    return {
+        "get_balance": ops_per_sec(lambda i: store.get_balance(GUILD_ID, i % USERS), ops),
+        "set_balance": ops_per_sec(lambda i: store.set_balance(GUILD_ID, i % USERS, i), ops),
+        "add_balance": ops_per_sec(lambda i: store.add_balance(GUILD_ID, i % USERS, 1000), ops),
+        "remove_balance": ops_per_sec(lambda i: store.remove_balance(GUILD_ID, i % USERS, 10), ops),
+        "top_balances": ops_per_sec(lambda i: store.top_balances(GUILD_ID, 250), max(ops // 10, 1)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ops", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        before = run(LegacyStore(os.path.join(tmp, "legacy.db")), args.ops)
+        db = Database(os.path.join(tmp, "pooled.db"))
+        after = run(db, args.ops)
+        db.close()
+
+    print(f"{'helper':<16}{'antes ops/s':>14}{'después ops/s':>16}{'x':>8}")
+    for name in before:
+        print(f"{name:<16}{before[name]:>14,.0f}{after[name]:>16,.0f}{after[name] / before[name]:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Microbenchmark del parser de mensajes de regear (mensajes/s).
+
+Compara el método anterior de on_message (re.findall sin compilar + Counter
+de strings + NUMBER_VALUES por clave str) con regear_parser.RegearParser
+sobre un corpus sintético de posts de regear.
+
+    python benchmarks/bench_parser.py [--messages 20000]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from regear_parser import RegearParser  # noqa: E402
+
+NUMBER_VALUES = {
+    "1": 925000, "2": 1037000, "3": 744000, "4": 838000, "5": 696000, "6": 1094000,
+    "7": 1393000, "8": 857000, "9": 1018000, "10": 824000, "11": 831000, "12": 1259000,
+    "13": 1284000, "14": 1299000, "15": 1461000, "16": 950000, "17": 675000, "18": 682000,
+    "19": 740000, "20": 1243000, "21": 1768000, "22": 1126000, "23": 1517000, "24": 1653000,
+    "25": 3179000, "26": 1003000, "27": 2535000, "28": 6000000, "29": 4000000,
+}
+
+TEMPLATES = (
+    "{nums}",
+    "regear {nums} pls",
+    "Regear ZvZ {nums} murió en la cta de las 22:00 🙏",
+    "{nums} @Caller gracias!!",
+    "muerte en 4.3 mapa Qiitun, build {nums}, caller <@682425081300779058>",
+    "Hola admins, pido regear de {nums}. Adjunto captura del killboard 📸 https://albiononline.com/killboard/kill/123456789",
+    "se me cayó el pc en mitad de la pelea 😭 {nums}",
+)
+
+
+def corpus(size: int):
+    rng = random.Random(3)
+    messages = []
+    for _ in range(size):
+        nums = " ".join(str(rng.randint(1, 29)) for _ in range(rng.randint(1, 4)))
+        messages.append(rng.choice(TEMPLATES).format(nums=nums))
+    return messages
+
+
+def legacy_parse(content: str):
+    numbers = re.findall(r'\b(?:[1-9]|1[0-9]|2[0-9])\b', content)
+    numbers_counter = Counter(numbers)
+    total_value = sum(NUMBER_VALUES.get(num, 0) * count for num, count in numbers_counter.items())
+    return numbers_counter, total_value
+
+
+def rate(fn, messages) -> float:
+    start = time.perf_counter()
+    for message in messages:
+        fn(message)
+    return len(messages) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=20000)
+    args = parser.parse_args()
+
+    messages = corpus(args.messages)
+    regear = RegearParser(NUMBER_VALUES)
+    mismatches = sum(legacy_parse(m)[1] != regear.parse(m)[1] for m in messages)
+
+    before = rate(legacy_parse, messages)
+    after = rate(regear.parse, messages)
+    print(f"{len(messages):,} mensajes, totales distintos entre métodos: {mismatches}")
+    print(f"{'método':<24}{'mensajes/s':>14}")
+    print(f"{'on_message (antes)':<24}{before:>14,.0f}")
+    print(f"{'RegearParser':<24}{after:>14,.0f}")
+    print(f"{'mejora':<24}{after / before:>13.2f}x")
+
+
+if __name__ == "__main__":
+    main()
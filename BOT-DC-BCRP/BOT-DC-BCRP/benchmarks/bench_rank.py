@@ -0,0 +1,78 @@
+"""Benchmark del ranking de /balance con 100k usuarios sintéticos por servidor.
+
+Compara el método anterior (top 1000 + búsqueda en Python, "N/A" fuera del
+top) con la consulta indexada Database.balance_rank, con y sin el índice
+(guild_id, balance, user_id).
+
+    python benchmarks/bench_rank.py [--users 100000] [--lookups 500]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import Database  # noqa: E402
+
+GUILDS = (1398647954616619038, 1398647954616619039)
+
+
+def populate(db: Database, users: int):
+    rng = random.Random(42)
+    with db.transaction() as conn:
+        for guild_id in GUILDS:
+            conn.executemany(
+                "INSERT INTO balances (guild_id, user_id, balance) VALUES (?, ?, ?)",
+                ((guild_id, uid, rng.randrange(0, 50_000_000)) for uid in range(users)))
+    db.connection().execute("ANALYZE")
+
+
+def legacy_rank(db: Database, guild_id: int, user_id: int):
+    for idx, row in enumerate(db.top_balances(guild_id, limit=1000), start=1):
+        if row["user_id"] == user_id:
+            return idx
+    return None
+
+
+def measure(fn, lookups):
+    start = time.perf_counter()
+    for _ in lookups:
+        fn(*_)
+    elapsed = time.perf_counter() - start
+    return len(lookups) / elapsed, elapsed / len(lookups) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--lookups", type=int, default=500)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    lookups = [(rng.choice(GUILDS), rng.randrange(args.users)) for _ in range(args.lookups)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "rank.db"))
+        populate(db, args.users)
+
+        found = sum(legacy_rank(db, g, u) is not None for g, u in lookups)
+        results = {
+            "top1000 + scan (antes)": measure(lambda g, u: legacy_rank(db, g, u), lookups),
+            "balance_rank (índice)": measure(db.balance_rank, lookups),
+        }
+        db.connection().execute("DROP INDEX idx_balances_guild_rank")
+        results["balance_rank (sin índice)"] = measure(db.balance_rank, lookups)
+        db.close()
+
+    print(f"{args.users:,} usuarios x {len(GUILDS)} servidores, {args.lookups} búsquedas")
+    print(f"método anterior: ranking encontrado en {found}/{args.lookups} (el resto 'N/A')")
+    print(f"{'método':<28}{'búsquedas/s':>14}{'µs/búsqueda':>14}")
+    for name, (rate, micros) in results.items():
+        print(f"{name:<28}{rate:>14,.0f}{micros:>14,.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""Suite completa de microbenchmarks, sin conexión a Discord, con salida JSON.
+
+Mide cada helper de balances (Database y Balances), top_balances con 1k/10k/100k
+filas, el parseo de mensajes de regear de on_message y el render de páginas de
+update_balances_message. El JSON guarda el commit y la versión de Python, y
+`--compare` lo contrasta con una corrida anterior para detectar regresiones.
+
+    python benchmarks/run_all.py --json resultados.json
+    python benchmarks/run_all.py --compare base.json [--threshold 0.15]
+    python benchmarks/run_all.py --quick --only top pipeline
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_parser import NUMBER_VALUES, corpus  # noqa: E402
+from db import Database  # noqa: E402
+from leaderboard import render_balance_pages  # noqa: E402
+from regear_parser import RegearParser  # noqa: E402
+from store import Balances  # noqa: E402
+
+GUILD_ID = 1398647954616619038
+USERS = 500
+TOP_SIZES = (1_000, 10_000, 100_000)
+REPEATS = 5
+GROUPS = ("db", "store", "top", "pipeline")
+
+
+# ------------------ MEDICIÓN ------------------
+def measure(fn: Callable[[int], object], ops: int, repeats: int = REPEATS) -> Dict[str, float]:
+    """Repite `ops` llamadas `repeats` veces; reporta la mediana y la mejor ronda."""
+    rounds = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for i in range(ops):
+            fn(i)
+        rounds.append((time.perf_counter() - start) / ops)
+    median = statistics.median(rounds)
+    return {"ops_per_sec": 1 / median, "median_us": median * 1e6, "best_us": min(rounds) * 1e6, "ops": ops}
+
+
+async def measure_async(fn, ops: int, repeats: int = REPEATS) -> Dict[str, float]:
+    rounds = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for i in range(ops):
+            await fn(i)
+        rounds.append((time.perf_counter() - start) / ops)
+    median = statistics.median(rounds)
+    return {"ops_per_sec": 1 / median, "median_us": median * 1e6, "best_us": min(rounds) * 1e6, "ops": ops}
+
+
+# ------------------ CASOS ------------------
+def bench_database(tmp: str, ops: int) -> Dict[str, Dict[str, float]]:
+    db = Database(os.path.join(tmp, "helpers.db"))
+    db.add_balances(GUILD_ID, [(uid, 1_000_000) for uid in range(USERS)])
+    results = {
+        "db.get_balance": measure(lambda i: db.get_balance(GUILD_ID, i % USERS), ops),
+        "db.set_balance": measure(lambda i: db.set_balance(GUILD_ID, i % USERS, 1_000_000), ops),
+        "db.add_balance": measure(lambda i: db.add_balance(GUILD_ID, i % USERS, 1000), ops),
+        "db.remove_balance": measure(lambda i: db.remove_balance(GUILD_ID, i % USERS, 10), ops),
+        "db.transfer": measure(lambda i: db.transfer(GUILD_ID, i % USERS, (i + 1) % USERS, 10), ops),
+        "db.balance_rank": measure(lambda i: db.balance_rank(GUILD_ID, i % USERS), ops),
+        "db.add_balances[100]": measure(
+            lambda i: db.add_balances(GUILD_ID, [(uid, 1) for uid in range(100)]), max(ops // 10, 1)),
+    }
+    db.close()
+    return results
+
+
+async def bench_store(tmp: str, ops: int) -> Dict[str, Dict[str, float]]:
+    store = Balances(Database(os.path.join(tmp, "store.db")), durability="strict")
+    await store.add_many(GUILD_ID, [(uid, 1_000_000) for uid in range(USERS)])
+    results = {
+        "store.get": await measure_async(lambda i: store.get(GUILD_ID, i % USERS), ops),
+        "store.add": await measure_async(lambda i: store.add(GUILD_ID, i % USERS, 1000), ops),
+        "store.remove": await measure_async(lambda i: store.remove(GUILD_ID, i % USERS, 10), ops),
+        "store.transfer": await measure_async(
+            lambda i: store.transfer(GUILD_ID, i % USERS, (i + 1) % USERS, 10), ops),
+        "store.add_many[100]": await measure_async(
+            lambda i: store.add_many(GUILD_ID, [(uid, 1) for uid in range(100)]), max(ops // 10, 1)),
+        "store.history": await measure_async(lambda i: store.history(GUILD_ID, i % USERS), ops),
+    }
+    await store.aclose()
+    return results
+
+
+def bench_top(tmp: str, ops: int, sizes=TOP_SIZES) -> Dict[str, Dict[str, float]]:
+    results = {}
+    rng = random.Random(7)
+    for size in sizes:
+        db = Database(os.path.join(tmp, f"top_{size}.db"))
+        with db.transaction() as conn:
+            conn.executemany("INSERT INTO balances (guild_id, user_id, balance) VALUES (?, ?, ?)",
+                             ((GUILD_ID, uid, rng.randrange(0, 50_000_000)) for uid in range(size)))
+        results[f"db.top_balances[{size // 1000}k]"] = measure(
+            lambda i: db.top_balances(GUILD_ID, 250), max(ops // 10, 1))
+        # Página de /top a media tabla: con cursor cuesta lo mismo que la primera
+        middle = db.top_balances(GUILD_ID, size // 2)[-1]
+        cursor = (middle["balance"], middle["user_id"])
+        results[f"db.top_page[{size // 1000}k]"] = measure(lambda i: db.top_page(GUILD_ID, cursor, 11), ops)
+        db.close()
+    return results
+
+
+def bench_pipeline(messages: int) -> Dict[str, Dict[str, float]]:
+    parser = RegearParser(NUMBER_VALUES)
+    posts = corpus(messages)
+    rows = [{"user_id": 10 ** 17 + uid, "balance": (250 - uid) * 1_000_000} for uid in range(250)]
+    return {
+        "regear.parse": measure(lambda i: parser.parse(posts[i]), messages),
+        "leaderboard.render[250]": measure(lambda i: render_balance_pages(rows), max(messages // 20, 1)),
+    }
+
+
+# ------------------ SALIDA ------------------
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except Exception:
+        return ""
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline_path: str, threshold: float) -> List[str]:
+    """Imprime la comparación y devuelve los casos más lentos que `threshold`."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"\nComparación con {baseline_path} (commit {baseline.get('commit') or '?'})")
+    print(f"{'caso':<28}{'antes µs':>12}{'ahora µs':>12}{'cambio':>10}")
+    regressions = []
+    for name, result in results.items():
+        old = baseline.get("results", {}).get(name)
+        if old is None:
+            print(f"{name:<28}{'-':>12}{result['median_us']:>12.1f}{'nuevo':>10}")
+            continue
+        change = result["median_us"] / old["median_us"] - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  ⚠️"
+        print(f"{name:<28}{old['median_us']:>12.1f}{result['median_us']:>12.1f}{change:>+10.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ops", type=int, default=2000, help="llamadas por ronda en los helpers")
+    parser.add_argument("--messages", type=int, default=20000, help="mensajes de regear por ronda")
+    parser.add_argument("--quick", action="store_true", help="rondas cortas y top solo hasta 10k")
+    parser.add_argument("--only", nargs="+", choices=GROUPS, default=GROUPS, help="grupos a correr")
+    parser.add_argument("--json", dest="json_path", help="guardar los resultados en este archivo")
+    parser.add_argument("--compare", help="JSON de una corrida anterior")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="aumento de la mediana que cuenta como regresión (0.15 = 15%%)")
+    args = parser.parse_args()
+
+    ops, messages, sizes = args.ops, args.messages, TOP_SIZES
+    if args.quick:
+        ops, messages, sizes = max(ops // 10, 10), max(messages // 10, 100), TOP_SIZES[:2]
+
+    results: Dict[str, Dict[str, float]] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        if "db" in args.only:
+            results.update(bench_database(tmp, ops))
+        if "store" in args.only:
+            results.update(asyncio.run(bench_store(tmp, ops)))
+        if "top" in args.only:
+            results.update(bench_top(tmp, ops, sizes))
+    if "pipeline" in args.only:
+        results.update(bench_pipeline(messages))
+
+    print(f"{'caso':<28}{'ops/s':>14}{'mediana µs':>14}{'mejor µs':>12}")
+    for name, r in results.items():
+        print(f"{name:<28}{r['ops_per_sec']:>14,.0f}{r['median_us']:>14.1f}{r['best_us']:>12.1f}")
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "timestamp": int(time.time()),
+        "results": results,
+    }
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"\nResultados guardados en {args.json_path}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            print(f"\n⚠️ Regresiones (> {args.threshold:.0%}): {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Prueba de estrés de transferencias concurrentes: el silver total se conserva.
+
+Lanza miles de transferencias aleatorias en paralelo contra Balances.transfer
+(event loop) y Database.transfer (varios hilos, una conexión por hilo) y
+comprueba que la suma de balances no cambia y que nadie queda en negativo.
+
+    python benchmarks/stress_transfer.py [--transfers 5000] [--users 50]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import Database  # noqa: E402
+from store import Balances  # noqa: E402
+
+GUILD_ID = 1398647954616619038
+START_BALANCE = 1_000_000
+
+
+def plan(transfers: int, users: int):
+    rng = random.Random(1)
+    return [(rng.randrange(users), rng.randrange(users), rng.randrange(1, 400_000))
+            for _ in range(transfers)]
+
+
+def check(db: Database, users: int, label: str, ok: int, total: int, seconds: float):
+    rows = db.connection().execute(
+        "SELECT COALESCE(SUM(balance), 0), COALESCE(MIN(balance), 0) FROM balances WHERE guild_id = ?",
+        (GUILD_ID,)).fetchone()
+    expected = users * START_BALANCE
+    status = "OK" if rows[0] == expected and rows[1] >= 0 else "FALLO"
+    print(f"{label:<28}{ok:>6}/{total:<6} aceptadas  {total / seconds:>10,.0f} transf/s  "
+          f"suma={rows[0]:,} (esperada {expected:,}) mínimo={rows[1]:,}  {status}")
+    return status == "OK"
+
+
+async def run_store(path: str, moves, users: int) -> bool:
+    db = Database(path)
+    store = Balances(db)
+    await store.add_many(GUILD_ID, [(uid, START_BALANCE) for uid in range(users)])
+    start = time.perf_counter()
+    results = await asyncio.gather(*(store.transfer(GUILD_ID, s, r, a) for s, r, a in moves))
+    seconds = time.perf_counter() - start
+    await store.flush()
+    ok = check(db, users, "Balances.transfer", sum(r is not None for r in results), len(moves), seconds)
+    await store.aclose()
+    return ok
+
+
+def run_threads(path: str, moves, users: int, threads: int) -> bool:
+    db = Database(path)
+    db.add_balances(GUILD_ID, [(uid, START_BALANCE) for uid in range(users)])
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(lambda m: db.transfer(GUILD_ID, *m), moves))
+    seconds = time.perf_counter() - start
+    ok = check(db, users, f"Database.transfer ({threads} hilos)",
+               sum(r is not None for r in results), len(moves), seconds)
+    db.close()
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--transfers", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    moves = plan(args.transfers, args.users)
+    with tempfile.TemporaryDirectory() as tmp:
+        ok = asyncio.run(run_store(os.path.join(tmp, "store.db"), moves, args.users))
+        ok &= run_threads(os.path.join(tmp, "threads.db"), moves, args.users, args.threads)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Importar/exportar balances y migrar los JSON de la versión anterior.
+
+Las filas se leen y escriben por bloques (memoria constante aunque haya
+millones) y se cargan con inserciones en lote, una transacción por bloque.
+Importar modifica la base de datos por fuera de la caché del bot: hacerlo con
+el bot detenido. Exportar se puede hacer en cualquier momento.
+
+    python datatool.py export balances.csv [--guild ID]
+    python datatool.py export - --format jsonl > balances.jsonl
+    python datatool.py import balances.csv [--guild ID] [--only-new]
+    python datatool.py migrate --guild ID [--balances balances.json] [--regear regear_data.json]
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+from contextlib import contextmanager
+from typing import IO, Iterable, Iterator, Optional, Tuple
+
+from db import DB_PATH, Database
+
+FIELDS = ("guild_id", "user_id", "balance")
+Row = Tuple[int, int, int]
+
+
+# ------------------ FORMATOS ------------------
+def detect_format(path: str, fmt: Optional[str]) -> str:
+    if fmt:
+        return fmt
+    return "jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv"
+
+
+def write_rows(rows: Iterable[Row], out: IO[str], fmt: str) -> int:
+    count = 0
+    if fmt == "csv":
+        writer = csv.writer(out)
+        writer.writerow(FIELDS)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    else:
+        for guild_id, user_id, balance in rows:
+            out.write(json.dumps({"guild_id": guild_id, "user_id": user_id, "balance": balance}) + "\n")
+            count += 1
+    return count
+
+
+def read_rows(src: IO[str], fmt: str, guild_id: Optional[int]) -> Iterator[Row]:
+    """Filas del archivo una a una; `guild_id` completa (o reemplaza) la columna del archivo."""
+    records = csv.DictReader(src) if fmt == "csv" else (json.loads(line) for line in src if line.strip())
+    for n, record in enumerate(records, start=1):
+        try:
+            guild = guild_id if guild_id is not None else int(record["guild_id"])
+            yield guild, int(record["user_id"]), int(record["balance"])
+        except (KeyError, TypeError, ValueError) as e:
+            raise SystemExit(f"❌ Fila {n} inválida ({e}): {record}")
+
+
+def export_balances(db: Database, path: str, guild_id: Optional[int] = None, fmt: str = "csv") -> int:
+    """Escribe los balances en `path`; devuelve cuántas filas exportó."""
+    with open(path, "w", encoding="utf-8", newline="") as out:
+        return write_rows(db.iter_balances(guild_id), out, fmt)
+
+
+@contextmanager
+def open_text(path: str, mode: str):
+    if path == "-":
+        yield sys.stdout if "w" in mode else sys.stdin
+    else:
+        with open(path, mode, encoding="utf-8", newline="") as f:
+            yield f
+
+
+# ------------------ MIGRACIÓN DE LOS JSON ANTIGUOS ------------------
+def legacy_balances(path: str, guild_id: int) -> Iterator[Row]:
+    """balances.json: {"user_id": {"balance": n}}."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    for user_id, entry in data.items():
+        balance = entry.get("balance", 0) if isinstance(entry, dict) else entry
+        yield guild_id, int(user_id), int(balance)
+
+
+def migrate_regear(db: Database, path: str, guild_id: int) -> Tuple[int, int]:
+    """regear_data.json: {"user_id": {"approved": [...], "pending": [...]}} al historial
+    de approval_queue como solicitudes ya resueltas (no mueve balances: lo aprobado
+    ya está contado en balances.json). El rol antiguo (un nombre, no un número de
+    rol) queda en la nota de legacy_imports. Devuelve (leídas, nuevas)."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    seen = added = 0
+    for user_id, lists in data.items():
+        for bucket, default_status in (("approved", "Aprobado"), ("pending", "Pendiente")):
+            for index, entry in enumerate(lists.get(bucket, [])):
+                seen += 1
+                added += db.import_request(
+                    "regear_data.json", f"{guild_id}:{user_id}:{bucket}:{index}", guild_id, int(user_id),
+                    int(entry.get("value", 0)), int(entry.get("msg_id") or 0),
+                    entry.get("status", default_status), note=f"rol {entry.get('role', '?')}")
+    return seen, added
+
+
+# ------------------ CLI ------------------
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=DB_PATH, help=f"base de datos (por defecto {DB_PATH})")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export = sub.add_parser("export", help="exportar balances")
+    export.add_argument("path", help="archivo de salida o - para stdout")
+    export.add_argument("--format", choices=("csv", "jsonl"))
+    export.add_argument("--guild", type=int)
+
+    load = sub.add_parser("import", help="importar balances (absolutos) desde CSV o JSON Lines")
+    load.add_argument("path", help="archivo de entrada o - para stdin")
+    load.add_argument("--format", choices=("csv", "jsonl"))
+    load.add_argument("--guild", type=int, help="guild de todas las filas (si el archivo no lo trae)")
+    load.add_argument("--only-new", action="store_true", help="no tocar jugadores que ya tienen balance")
+
+    migrate = sub.add_parser("migrate", help="migrar balances.json y regear_data.json")
+    migrate.add_argument("--guild", type=int, required=True, help="guild al que pertenecían los datos")
+    migrate.add_argument("--balances", default="balances.json")
+    migrate.add_argument("--regear", default="regear_data.json")
+
+    args = parser.parse_args()
+    db = Database(args.db)
+    try:
+        if args.command == "export":
+            fmt = detect_format(args.path, args.format)
+            with open_text(args.path, "w") as out:
+                count = write_rows(db.iter_balances(args.guild), out, fmt)
+            print(f"📤 {count:,} balances exportados", file=sys.stderr)
+
+        elif args.command == "import":
+            fmt = detect_format(args.path, args.format)
+            with open_text(args.path, "r") as src:
+                seen, changed = db.import_balances(read_rows(src, fmt, args.guild), only_new=args.only_new,
+                                                   note=os.path.basename(args.path))
+            print(f"📥 {seen:,} filas leídas, {changed:,} balances cambiados", file=sys.stderr)
+
+        else:
+            if os.path.exists(args.balances):
+                seen, changed = db.import_balances(legacy_balances(args.balances, args.guild), only_new=True,
+                                                   kind="migracion", note=os.path.basename(args.balances))
+                print(f"💰 {args.balances}: {seen} jugadores, {changed} nuevos", file=sys.stderr)
+            if os.path.exists(args.regear):
+                seen, added = migrate_regear(db, args.regear, args.guild)
+                print(f"📜 {args.regear}: {seen} solicitudes, {added} nuevas", file=sys.stderr)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
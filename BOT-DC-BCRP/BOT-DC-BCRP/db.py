@@ -0,0 +1,603 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# ------------------ CONFIG ------------------
+DB_PATH = os.getenv("DB_PATH", "balances.db")
+# NORMAL es seguro en modo WAL ante caídas del proceso; FULL también ante cortes de luz.
+DB_SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", "NORMAL")
+DB_CACHE_KB = int(os.getenv("DB_CACHE_KB", "8192"))
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS balances (
+        guild_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        balance INTEGER DEFAULT 0,
+        PRIMARY KEY (guild_id, user_id)
+    );
+    -- (guild_id, balance, user_id): orden total del ranking, sirve de cursor para /top
+    DROP INDEX IF EXISTS idx_balances_guild_balance;
+    CREATE INDEX IF NOT EXISTS idx_balances_guild_rank ON balances (guild_id, balance, user_id);
+    CREATE TABLE IF NOT EXISTS approval_queue (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        guild_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        numbers TEXT NOT NULL,
+        total_value INTEGER NOT NULL,
+        channel_id INTEGER NOT NULL,
+        message_id INTEGER NOT NULL,
+        attachments TEXT NOT NULL,
+        status TEXT NOT NULL,
+        created_at INTEGER NOT NULL,
+        updated_at INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_approval_queue_status ON approval_queue (status, id);
+    -- Libro de movimientos: una fila por cambio de balance, nunca se modifica
+    CREATE TABLE IF NOT EXISTS ledger (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        guild_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        delta INTEGER NOT NULL,
+        balance INTEGER NOT NULL,
+        kind TEXT NOT NULL,
+        actor_id INTEGER,
+        note TEXT NOT NULL DEFAULT '',
+        created_at INTEGER NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_ledger_guild_user ON ledger (guild_id, user_id, id);
+    CREATE INDEX IF NOT EXISTS idx_ledger_guild_time ON ledger (guild_id, created_at);
+    CREATE TRIGGER IF NOT EXISTS ledger_no_update BEFORE UPDATE ON ledger
+    BEGIN SELECT RAISE(ABORT, 'ledger es solo de inserción'); END;
+    CREATE TRIGGER IF NOT EXISTS ledger_no_delete BEFORE DELETE ON ledger
+    BEGIN SELECT RAISE(ABORT, 'ledger es solo de inserción'); END;
+    -- Mensajes fijos del bot por servidor ("approval", "balances"), en orden de página
+    CREATE TABLE IF NOT EXISTS pinned_messages (
+        guild_id INTEGER NOT NULL,
+        kind TEXT NOT NULL,
+        position INTEGER NOT NULL,
+        channel_id INTEGER NOT NULL,
+        message_id INTEGER NOT NULL,
+        PRIMARY KEY (guild_id, kind, position)
+    );
+    -- Configuración por servidor (canales, roles admin, precios); valores en JSON
+    CREATE TABLE IF NOT EXISTS guild_config (
+        guild_id INTEGER NOT NULL,
+        key TEXT NOT NULL,
+        value TEXT NOT NULL,
+        updated_at INTEGER NOT NULL,
+        PRIMARY KEY (guild_id, key)
+    );
+    -- Registros ya migrados desde los JSON antiguos, para que migrar dos veces no duplique
+    CREATE TABLE IF NOT EXISTS legacy_imports (
+        source TEXT NOT NULL,
+        key TEXT NOT NULL,
+        note TEXT NOT NULL DEFAULT '',
+        PRIMARY KEY (source, key)
+    );
+"""
+
+# Las sentencias son constantes de módulo para que el caché de sentencias
+# preparadas de sqlite3 (por texto SQL) las reutilice en cada llamada.
+SQL_GET = "SELECT balance FROM balances WHERE guild_id = ? AND user_id = ?"
+SQL_SET = """
+    INSERT INTO balances (guild_id, user_id, balance)
+    VALUES (?, ?, ?)
+    ON CONFLICT(guild_id, user_id) DO UPDATE SET balance = excluded.balance
+"""
+SQL_ADD = """
+    INSERT INTO balances (guild_id, user_id, balance)
+    VALUES (?, ?, ?)
+    ON CONFLICT(guild_id, user_id) DO UPDATE SET balance = balance + excluded.balance
+    RETURNING balance
+"""
+SQL_REMOVE = """
+    UPDATE balances
+    SET balance = MAX(balance - ?, 0)
+    WHERE guild_id = ? AND user_id = ?
+    RETURNING balance
+"""
+SQL_ADD_DELTA = """
+    INSERT INTO balances (guild_id, user_id, balance)
+    VALUES (?1, ?2, MAX(?3, 0))
+    ON CONFLICT(guild_id, user_id) DO UPDATE SET balance = MAX(balance + ?3, 0)
+"""
+# Balances de una lista de jugadores (JSON) en una sola consulta, sin límite de parámetros
+SQL_GET_MANY = """
+    SELECT user_id, balance FROM balances
+    WHERE guild_id = ? AND user_id IN (SELECT value FROM json_each(?))
+"""
+SQL_DEBIT_IF = """
+    UPDATE balances SET balance = balance - ?3
+    WHERE guild_id = ?1 AND user_id = ?2 AND balance >= ?3
+    RETURNING balance
+"""
+SQL_TOP = "SELECT user_id, balance FROM balances WHERE guild_id = ? ORDER BY balance DESC, user_id DESC LIMIT ?"
+# Página siguiente a la fila (balance, user_id) del cursor, sin OFFSET: busca en el índice
+SQL_TOP_AFTER = """
+    SELECT user_id, balance FROM balances
+    WHERE guild_id = ?1 AND (balance, user_id) < (?2, ?3)
+    ORDER BY balance DESC, user_id DESC LIMIT ?4
+"""
+SQL_GUILD = "SELECT user_id, balance FROM balances WHERE guild_id = ?"
+# Posición = 1 + jugadores con más balance; recorre solo idx_balances_guild_rank.
+SQL_RANK = """
+    SELECT COUNT(*) + 1 FROM balances
+    WHERE guild_id = ?1 AND balance > (
+        SELECT balance FROM balances WHERE guild_id = ?1 AND user_id = ?2
+    )
+"""
+
+
+# ------------------ COLA DE APROBACIÓN ------------------
+# Estado de las solicitudes aún sin revisar; al resolverlas se guarda el estado
+# final ("Aprobado", "Rechazado", "Pendiente").
+STATUS_QUEUED = "En cola"
+SQL_ENQUEUE = """
+    INSERT INTO approval_queue (guild_id, user_id, numbers, total_value, channel_id,
+                                message_id, attachments, status, created_at, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+SQL_QUEUED = f"SELECT * FROM approval_queue WHERE status = '{STATUS_QUEUED}' ORDER BY id"
+SQL_QUEUED_GUILD = f"SELECT * FROM approval_queue WHERE status = '{STATUS_QUEUED}' AND guild_id = ? ORDER BY id"
+SQL_RESOLVE = f"UPDATE approval_queue SET status = ?, updated_at = ? WHERE id = ? AND status = '{STATUS_QUEUED}'"
+
+
+# ------------------ LEDGER ------------------
+SQL_LEDGER_INSERT = """
+    INSERT INTO ledger (guild_id, user_id, delta, balance, kind, actor_id, note, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+# Paginación por cursor (id): cada página es un rango del índice, sin OFFSET
+SQL_LEDGER_PAGE = """
+    SELECT id, delta, balance, kind, actor_id, note, created_at FROM ledger
+    WHERE guild_id = ? AND user_id = ? AND id < ?
+    ORDER BY id DESC LIMIT ?
+"""
+LedgerEntry = Tuple[int, int, int, int, str, Optional[int], str, int]
+
+
+# ------------------ MENSAJES FIJOS ------------------
+SQL_PINNED = """
+    SELECT channel_id, message_id FROM pinned_messages
+    WHERE guild_id = ? AND kind = ? ORDER BY position
+"""
+SQL_PINNED_CLEAR = "DELETE FROM pinned_messages WHERE guild_id = ? AND kind = ?"
+SQL_PINNED_INSERT = """
+    INSERT INTO pinned_messages (guild_id, kind, position, channel_id, message_id)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+
+# ------------------ MANTENIMIENTO ------------------
+SQL_HAS_STATS = "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'"
+
+
+# ------------------ IMPORTAR / EXPORTAR ------------------
+IMPORT_CHUNK = 10_000
+SQL_EXPORT = "SELECT guild_id, user_id, balance FROM balances ORDER BY guild_id, user_id"
+SQL_EXPORT_GUILD = "SELECT guild_id, user_id, balance FROM balances WHERE guild_id = ? ORDER BY user_id"
+SQL_IMPORT_TEMP = """
+    CREATE TEMP TABLE IF NOT EXISTS import_chunk (
+        guild_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        balance INTEGER NOT NULL,
+        PRIMARY KEY (guild_id, user_id)
+    )
+"""
+# Si un bloque repite jugador, gana la última fila
+SQL_IMPORT_STAGE = "INSERT OR REPLACE INTO import_chunk (guild_id, user_id, balance) VALUES (?, ?, MAX(?, 0))"
+SQL_IMPORT_LEDGER = """
+    INSERT INTO ledger (guild_id, user_id, delta, balance, kind, actor_id, note, created_at)
+    SELECT c.guild_id, c.user_id, c.balance - COALESCE(b.balance, 0), c.balance, ?1, NULL, ?2, ?3
+    FROM import_chunk c LEFT JOIN balances b ON b.guild_id = c.guild_id AND b.user_id = c.user_id
+    WHERE c.balance != COALESCE(b.balance, 0)
+"""
+SQL_IMPORT_LEDGER_NEW = """
+    INSERT INTO ledger (guild_id, user_id, delta, balance, kind, actor_id, note, created_at)
+    SELECT c.guild_id, c.user_id, c.balance, c.balance, ?1, NULL, ?2, ?3
+    FROM import_chunk c LEFT JOIN balances b ON b.guild_id = c.guild_id AND b.user_id = c.user_id
+    WHERE b.user_id IS NULL AND c.balance != 0
+"""
+SQL_IMPORT_APPLY = """
+    INSERT INTO balances (guild_id, user_id, balance)
+    SELECT guild_id, user_id, balance FROM import_chunk WHERE true
+    ON CONFLICT(guild_id, user_id) DO UPDATE SET balance = excluded.balance
+"""
+SQL_IMPORT_APPLY_NEW = """
+    INSERT INTO balances (guild_id, user_id, balance)
+    SELECT guild_id, user_id, balance FROM import_chunk WHERE true
+    ON CONFLICT(guild_id, user_id) DO NOTHING
+"""
+SQL_IMPORT_CLEAR = "DELETE FROM import_chunk"
+SQL_LEGACY_MARK = "INSERT OR IGNORE INTO legacy_imports (source, key, note) VALUES (?, ?, ?)"
+
+
+# ------------------ CONFIGURACIÓN POR SERVIDOR ------------------
+SQL_CONFIG = "SELECT key, value FROM guild_config WHERE guild_id = ?"
+SQL_CONFIG_SET = """
+    INSERT INTO guild_config (guild_id, key, value, updated_at) VALUES (?, ?, ?, ?)
+    ON CONFLICT(guild_id, key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at
+"""
+SQL_CONFIG_DELETE = "DELETE FROM guild_config WHERE guild_id = ? AND key = ?"
+
+
+class Database:
+    """Conexiones SQLite de larga vida (una por hilo) en modo WAL.
+
+    Las escrituras se serializan con `lock` dentro del proceso y con
+    BEGIN IMMEDIATE + busy_timeout entre procesos.
+    """
+
+    def __init__(self, path: str = DB_PATH, synchronous: str = DB_SYNCHRONOUS,
+                 cache_kb: int = DB_CACHE_KB, cached_statements: int = 128):
+        self.path = path
+        self.synchronous = synchronous
+        self.cache_kb = cache_kb
+        self.cached_statements = cached_statements
+        self.lock = threading.RLock()
+        self._local = threading.local()
+        self._conns: List[sqlite3.Connection] = []
+        self._conns_lock = threading.Lock()
+
+        with self.lock:
+            self.connection().executescript(SCHEMA)
+
+    # ------------------ CONEXIONES ------------------
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path,
+                               isolation_level=None,
+                               check_same_thread=False,
+                               cached_statements=self.cached_statements)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_kb)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        """Devuelve la conexión del hilo actual, creándola la primera vez."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._conns_lock:
+                self._conns.append(conn)
+        return conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Transacción de escritura: un solo commit (y un fsync) por bloque."""
+        with self.lock:
+            conn = self.connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def close(self):
+        """Cierra todas las conexiones abiertas por el pool."""
+        with self._conns_lock:
+            for conn in self._conns:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            self._conns.clear()
+        self._local = threading.local()
+
+    # ------------------ BALANCES ------------------
+    def get_balance(self, guild_id: int, user_id: int) -> int:
+        """Devuelve el balance actual de un usuario, 0 si no existe."""
+        row = self.connection().execute(SQL_GET, (guild_id, user_id)).fetchone()
+        return int(row["balance"]) if row else 0
+
+    # Cada mutación deja su fila de ledger en la misma transacción (`kind`,
+    # `actor_id`, `note`), igual que Balances en store.py.
+    @staticmethod
+    def _current(conn: sqlite3.Connection, guild_id: int, user_id: int) -> int:
+        row = conn.execute(SQL_GET, (guild_id, user_id)).fetchone()
+        return int(row["balance"]) if row else 0
+
+    @staticmethod
+    def _log(conn: sqlite3.Connection, guild_id: int, user_id: int, old: int, new: int,
+             kind: str, actor_id: Optional[int], note: str):
+        if new != old:
+            conn.execute(SQL_LEDGER_INSERT, (guild_id, user_id, new - old, new, kind, actor_id, note,
+                                             int(time.time())))
+
+    def set_balance(self, guild_id: int, user_id: int, amount: int, *,
+                    kind: str = "ajuste", actor_id: Optional[int] = None, note: str = ""):
+        """Establece el balance exacto de un usuario (reemplaza lo anterior)."""
+        with self.transaction() as conn:
+            old = self._current(conn, guild_id, user_id)
+            conn.execute(SQL_SET, (guild_id, user_id, amount))
+            self._log(conn, guild_id, user_id, old, amount, kind, actor_id, note)
+
+    def add_balance(self, guild_id: int, user_id: int, amount: int, *,
+                    kind: str = "ajuste", actor_id: Optional[int] = None, note: str = "") -> int:
+        """Suma de manera atómica el balance y devuelve el balance resultante."""
+        if amount <= 0:
+            return self.get_balance(guild_id, user_id)
+        with self.transaction() as conn:
+            new = int(conn.execute(SQL_ADD, (guild_id, user_id, amount)).fetchone()["balance"])
+            self._log(conn, guild_id, user_id, new - amount, new, kind, actor_id, note)
+        return new
+
+    def remove_balance(self, guild_id: int, user_id: int, amount: int, *,
+                       kind: str = "ajuste", actor_id: Optional[int] = None, note: str = "") -> int:
+        """Resta balance de manera atómica (sin negativos) y devuelve el resultado."""
+        if amount <= 0:
+            return self.get_balance(guild_id, user_id)
+        with self.transaction() as conn:
+            old = self._current(conn, guild_id, user_id)
+            row = conn.execute(SQL_REMOVE, (amount, guild_id, user_id)).fetchone()
+            if row is None:
+                return 0
+            self._log(conn, guild_id, user_id, old, int(row["balance"]), kind, actor_id, note)
+        return int(row["balance"])
+
+    def add_balances(self, guild_id: int, changes: Iterable[Tuple[int, int]], *,
+                     kind: str = "ajuste", actor_id: Optional[int] = None, note: str = ""):
+        """Aplica (user_id, delta) en una sola transacción; los débitos no bajan de 0.
+
+        Lee los balances actuales con una consulta y escribe balances y ledger
+        con un executemany cada uno.
+        """
+        changes = list(changes)
+        if not changes:
+            return
+        now = int(time.time())
+        with self.transaction() as conn:
+            users = json.dumps(sorted({user_id for user_id, _ in changes}))
+            current = {int(r["user_id"]): int(r["balance"]) for r in conn.execute(SQL_GET_MANY, (guild_id, users))}
+            ledger = []
+            for user_id, delta in changes:
+                old = current.get(user_id, 0)
+                new = current[user_id] = max(old + delta, 0)
+                if new != old:
+                    ledger.append((guild_id, user_id, new - old, new, kind, actor_id, note, now))
+            conn.executemany(SQL_ADD_DELTA, ((guild_id, user_id, delta) for user_id, delta in changes))
+            conn.executemany(SQL_LEDGER_INSERT, ledger)
+
+    def transfer(self, guild_id: int, sender_id: int, receiver_id: int,
+                 amount: int) -> Optional[Tuple[int, int]]:
+        """Débito condicional + abono en una transacción, con sus dos filas de ledger.
+
+        Devuelve (balance emisor, balance receptor) o None si no hay fondos.
+        """
+        with self.transaction() as conn:
+            row = conn.execute(SQL_DEBIT_IF, (guild_id, sender_id, amount)).fetchone()
+            if row is None:
+                return None
+            sender_balance = int(row["balance"])
+            if sender_id == receiver_id:
+                conn.execute(SQL_ADD, (guild_id, receiver_id, amount)).fetchone()
+                return sender_balance + amount, sender_balance + amount
+            self._log(conn, guild_id, sender_id, sender_balance + amount, sender_balance, "transferir",
+                      sender_id, f"a <@{receiver_id}>")
+            receiver = int(conn.execute(SQL_ADD, (guild_id, receiver_id, amount)).fetchone()["balance"])
+            self._log(conn, guild_id, receiver_id, receiver - amount, receiver, "transferir",
+                      sender_id, f"de <@{sender_id}>")
+        return sender_balance, receiver
+
+    def top_balances(self, guild_id: int, limit: int = 250) -> List[sqlite3.Row]:
+        """Devuelve lista de usuarios ordenada por balance descendente."""
+        return self.connection().execute(SQL_TOP, (guild_id, limit)).fetchall()
+
+    def top_page(self, guild_id: int, after: Optional[Tuple[int, int]] = None,
+                 limit: int = 10) -> List[sqlite3.Row]:
+        """Página del ranking que sigue a la fila `after` (balance, user_id); None es la primera."""
+        if after is None:
+            return self.connection().execute(SQL_TOP, (guild_id, limit)).fetchall()
+        return self.connection().execute(SQL_TOP_AFTER, (guild_id, after[0], after[1], limit)).fetchall()
+
+    def balance_rank(self, guild_id: int, user_id: int) -> Optional[int]:
+        """Posición del usuario en el ranking del servidor, None si no tiene balance."""
+        conn = self.connection()
+        if conn.execute(SQL_GET, (guild_id, user_id)).fetchone() is None:
+            return None
+        return int(conn.execute(SQL_RANK, (guild_id, user_id)).fetchone()[0])
+
+    def guild_balances(self, guild_id: int) -> Dict[int, int]:
+        """Todos los balances de un servidor como {user_id: balance}."""
+        rows = self.connection().execute(SQL_GUILD, (guild_id,))
+        return {int(r["user_id"]): int(r["balance"]) for r in rows}
+
+    def write_balances(self, items: List[Tuple[int, int, int]], ledger: List[LedgerEntry] = ()):
+        """Escribe (guild_id, user_id, balance) absolutos y sus movimientos de
+        ledger en una sola transacción."""
+        if not items and not ledger:
+            return
+        with self.transaction() as conn:
+            conn.executemany(SQL_SET, items)
+            conn.executemany(SQL_LEDGER_INSERT, ledger)
+
+    def resolve_requests(self, requests: Sequence[Tuple[int, int, int, int, str]], status: str,
+                         kind: str = "regear", actor_id: Optional[int] = None) -> List[int]:
+        """Resuelve solicitudes (request_id, guild_id, user_id, abono, nota) y acredita su
+        abono en la misma transacción.
+
+        Solo se acredita si SQL_RESOLVE cambió la fila (seguía "En cola"): si otro
+        proceso ya la resolvió, no hay abono. Devuelve los ids que sí se resolvieron.
+        """
+        applied = []
+        now = int(time.time())
+        with self.transaction() as conn:
+            for request_id, guild_id, user_id, amount, note in requests:
+                if conn.execute(SQL_RESOLVE, (status, now, request_id)).rowcount == 0:
+                    continue
+                applied.append(request_id)
+                if amount > 0:
+                    new = int(conn.execute(SQL_ADD, (guild_id, user_id, amount)).fetchone()["balance"])
+                    conn.execute(SQL_LEDGER_INSERT, (guild_id, user_id, amount, new, kind, actor_id, note, now))
+        return applied
+
+    def history(self, guild_id: int, user_id: int, before_id: Optional[int] = None,
+                limit: int = 10) -> List[sqlite3.Row]:
+        """Movimientos del usuario del más reciente al más antiguo, anteriores a `before_id`."""
+        cursor = before_id if before_id is not None else 2 ** 63 - 1
+        return self.connection().execute(SQL_LEDGER_PAGE, (guild_id, user_id, cursor, limit)).fetchall()
+
+    # ------------------ COLA DE APROBACIÓN ------------------
+    def enqueue_request(self, guild_id: int, user_id: int, numbers: str, total_value: int,
+                        channel_id: int, message_id: int, attachments: str) -> int:
+        """Guarda una solicitud de regear en cola y devuelve su id."""
+        now = int(time.time())
+        with self.transaction() as conn:
+            cur = conn.execute(SQL_ENQUEUE, (guild_id, user_id, numbers, total_value, channel_id,
+                                             message_id, attachments, STATUS_QUEUED, now, now))
+        return int(cur.lastrowid)
+
+    def queued_requests(self, guild_id: Optional[int] = None) -> List[sqlite3.Row]:
+        """Solicitudes aún sin resolver (de un servidor o de todos), en orden de llegada."""
+        if guild_id is None:
+            return self.connection().execute(SQL_QUEUED).fetchall()
+        return self.connection().execute(SQL_QUEUED_GUILD, (guild_id,)).fetchall()
+
+    # ------------------ MENSAJES FIJOS ------------------
+    def pinned_messages(self, guild_id: int, kind: str) -> List[Tuple[int, int]]:
+        """(channel_id, message_id) guardados para `kind`, en orden de página."""
+        rows = self.connection().execute(SQL_PINNED, (guild_id, kind)).fetchall()
+        return [(int(r["channel_id"]), int(r["message_id"])) for r in rows]
+
+    def save_pinned_messages(self, guild_id: int, kind: str, channel_id: int, message_ids: List[int]):
+        """Reemplaza los mensajes guardados para `kind` por `message_ids`."""
+        with self.transaction() as conn:
+            conn.execute(SQL_PINNED_CLEAR, (guild_id, kind))
+            conn.executemany(SQL_PINNED_INSERT, ((guild_id, kind, pos, channel_id, mid)
+                                                 for pos, mid in enumerate(message_ids)))
+
+    # ------------------ CONFIGURACIÓN POR SERVIDOR ------------------
+    def guild_config(self, guild_id: int) -> Dict[str, str]:
+        """Valores configurados para el servidor como {clave: JSON}."""
+        rows = self.connection().execute(SQL_CONFIG, (guild_id,))
+        return {r["key"]: r["value"] for r in rows}
+
+    def set_guild_config(self, guild_id: int, key: str, value: Optional[str]):
+        """Guarda (o con None, borra y vuelve al valor por defecto) una clave."""
+        with self.transaction() as conn:
+            if value is None:
+                conn.execute(SQL_CONFIG_DELETE, (guild_id, key))
+            else:
+                conn.execute(SQL_CONFIG_SET, (guild_id, key, value, int(time.time())))
+
+    # ------------------ MANTENIMIENTO ------------------
+    def optimize(self):
+        """ANALYZE la primera vez (sin estadísticas aún); después PRAGMA optimize,
+        que solo vuelve a analizar las tablas que cambiaron lo suficiente."""
+        with self.lock:
+            conn = self.connection()
+            if conn.execute(SQL_HAS_STATS).fetchone() is None:
+                conn.execute("ANALYZE")
+            else:
+                conn.execute("PRAGMA optimize")
+
+    # ------------------ IMPORTAR / EXPORTAR ------------------
+    def iter_balances(self, guild_id: Optional[int] = None,
+                      chunk: int = IMPORT_CHUNK) -> Iterator[Tuple[int, int, int]]:
+        """Recorre (guild_id, user_id, balance) en bloques de `chunk` filas, sin cargarlas todas."""
+        sql, params = (SQL_EXPORT_GUILD, (guild_id,)) if guild_id is not None else (SQL_EXPORT, ())
+        # Conexión propia: el cursor queda abierto mientras dure el recorrido
+        conn = self._connect()
+        try:
+            cur = conn.execute(sql, params)
+            while True:
+                rows = cur.fetchmany(chunk)
+                if not rows:
+                    break
+                for row in rows:
+                    yield int(row[0]), int(row[1]), int(row[2])
+        finally:
+            conn.close()
+
+    def import_balances(self, rows: Iterable[Tuple[int, int, int]], only_new: bool = False,
+                        kind: str = "importacion", note: str = "",
+                        chunk: int = IMPORT_CHUNK) -> Tuple[int, int]:
+        """Carga (guild_id, user_id, balance) absolutos por bloques, una transacción por bloque.
+
+        Cada bloque va a una tabla temporal y de ahí, con sentencias de conjunto,
+        al ledger (solo las filas que cambian) y a balances. Con `only_new` no se
+        tocan los jugadores que ya tienen balance. Repetir la misma importación
+        no cambia nada. Devuelve (filas leídas, filas que cambiaron).
+        """
+        seen = changed = 0
+        conn = self.connection()
+        with self.lock:
+            conn.execute(SQL_IMPORT_TEMP)
+        it = iter(rows)
+        while True:
+            batch = list(islice(it, chunk))
+            if not batch:
+                break
+            seen += len(batch)
+            with self.transaction() as conn:
+                conn.executemany(SQL_IMPORT_STAGE, batch)
+                cur = conn.execute(SQL_IMPORT_LEDGER_NEW if only_new else SQL_IMPORT_LEDGER,
+                                   (kind, note, int(time.time())))
+                changed += cur.rowcount
+                conn.execute(SQL_IMPORT_APPLY_NEW if only_new else SQL_IMPORT_APPLY)
+                conn.execute(SQL_IMPORT_CLEAR)
+        return seen, changed
+
+    def import_request(self, source: str, key: str, guild_id: int, user_id: int, total_value: int,
+                       message_id: int, status: str, note: str = "") -> bool:
+        """Guarda una solicitud histórica una sola vez por (source, key).
+
+        Solo queda como historial: se guarda sin números (`{}`; lo que traiga
+        el formato antiguo va en `note`, en legacy_imports) y nunca como
+        STATUS_QUEUED, así la cola de aprobación no la vuelve a cargar.
+        """
+        if status == STATUS_QUEUED:
+            status = "Pendiente"
+        now = int(time.time())
+        with self.transaction() as conn:
+            if conn.execute(SQL_LEGACY_MARK, (source, key, note)).rowcount != 1:
+                return False
+            conn.execute(SQL_ENQUEUE, (guild_id, user_id, "{}", total_value, 0,
+                                       message_id, "[]", status, now, now))
+        return True
+
+
+# ------------------ INSTANCIA POR DEFECTO ------------------
+_default: Optional[Database] = None
+_default_lock = threading.Lock()
+
+
+def get_db() -> Database:
+    """Instancia compartida sobre DB_PATH, creada en el primer uso."""
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = Database(DB_PATH)
+    return _default
+
+
+def get_balance(guild_id: int, user_id: int) -> int:
+    return get_db().get_balance(guild_id, user_id)
+
+
+def set_balance(guild_id: int, user_id: int, amount: int, **ledger):
+    get_db().set_balance(guild_id, user_id, amount, **ledger)
+
+
+def add_balance(guild_id: int, user_id: int, amount: int, **ledger) -> int:
+    return get_db().add_balance(guild_id, user_id, amount, **ledger)
+
+
+def remove_balance(guild_id: int, user_id: int, amount: int, **ledger) -> int:
+    return get_db().remove_balance(guild_id, user_id, amount, **ledger)
+
+
+def top_balances(guild_id: int, limit: int = 250) -> List[sqlite3.Row]:
+    return get_db().top_balances(guild_id, limit)
@@ -0,0 +1,54 @@
+import json
+from typing import Dict, FrozenSet, Iterable, Mapping, Optional, Union
+
+from regear_parser import RegearParser
+
+# Claves de la tabla guild_config; los valores se guardan como JSON
+CHANNEL_KEYS = ("approval_channel_id", "balances_channel_id", "logs_channel_id", "regear_channel_id")
+ADMIN_ROLES_KEY = "admin_role_ids"
+PRICES_KEY = "number_values"
+CONFIG_KEYS = CHANNEL_KEYS + (ADMIN_ROLES_KEY, PRICES_KEY)
+
+
+class GuildConfig:
+    """Configuración efectiva de un guild: valores propios sobre los por defecto.
+
+    Es inmutable: cada cambio construye un objeto nuevo (con su parser de
+    precios ya compilado) y reemplaza al anterior en la caché.
+    """
+
+    __slots__ = ("approval_channel_id", "balances_channel_id", "logs_channel_id", "regear_channel_id",
+                 "admin_role_ids", "number_values", "parser")
+
+    def __init__(self, approval_channel_id: Optional[int], balances_channel_id: Optional[int],
+                 logs_channel_id: Optional[int], regear_channel_id: Optional[int],
+                 admin_role_ids: Iterable[int], number_values: Mapping[Union[str, int], int]):
+        self.approval_channel_id = approval_channel_id
+        self.balances_channel_id = balances_channel_id
+        self.logs_channel_id = logs_channel_id
+        self.regear_channel_id = regear_channel_id
+        self.admin_role_ids: FrozenSet[int] = frozenset(int(r) for r in admin_role_ids)
+        self.number_values: Dict[int, int] = {int(k): int(v) for k, v in number_values.items() if int(v) > 0}
+        self.parser = RegearParser(self.number_values)
+
+    def is_admin_role(self, role_id: int) -> bool:
+        return role_id in self.admin_role_ids
+
+    def as_values(self) -> Dict[str, object]:
+        """Valores en el formato que se guarda en guild_config."""
+        return {
+            "approval_channel_id": self.approval_channel_id,
+            "balances_channel_id": self.balances_channel_id,
+            "logs_channel_id": self.logs_channel_id,
+            "regear_channel_id": self.regear_channel_id,
+            ADMIN_ROLES_KEY: sorted(self.admin_role_ids),
+            PRICES_KEY: {str(k): v for k, v in sorted(self.number_values.items())},
+        }
+
+    def merged(self, overrides: Mapping[str, str]) -> "GuildConfig":
+        """Nueva configuración con `overrides` ({clave: JSON}) aplicados sobre esta."""
+        values = self.as_values()
+        for key, raw in overrides.items():
+            if key in CONFIG_KEYS:
+                values[key] = json.loads(raw)
+        return GuildConfig(**values)
@@ -0,0 +1,93 @@
+import json
+import os
+from typing import Dict, Iterator, List, Optional
+
+import discord
+
+from approvals import ApprovalQueue
+from db import Database
+from guild_config import GuildConfig
+from leaderboard import TopSnapshot
+from store import Balances
+
+# Segundos que se reutiliza una página de /top antes de volver a consultarla (lo que
+# puede tardar un cambio de balance en verse en /top)
+TOP_SNAPSHOT_TTL = float(os.getenv("TOP_SNAPSHOT_TTL", "30"))
+
+
+class GuildState:
+    """Estado en memoria de un guild: su configuración, su cola de aprobación,
+    sus mensajes fijos, las huellas de las páginas de balances publicadas y la
+    foto del ranking que comparten las vistas de /top."""
+
+    __slots__ = ("guild_id", "config", "queue", "approval_message", "balances_messages", "page_hashes",
+                 "startup_seconds", "top")
+
+    def __init__(self, guild_id: int, store: Balances):
+        self.guild_id = guild_id
+        self.config: Optional[GuildConfig] = None  # se carga con GuildRegistry.config
+        self.queue = ApprovalQueue(store, guild_id)
+        self.approval_message: Optional[discord.Message] = None
+        self.balances_messages: List[discord.Message] = []
+        self.page_hashes: Dict[int, str] = {}  # message_id -> huella del contenido publicado
+        self.startup_seconds: Optional[float] = None
+        self.top = TopSnapshot(lambda after, limit: store.top_page(guild_id, after, limit), TOP_SNAPSHOT_TTL)
+
+
+class GuildRegistry:
+    """Estados por guild, creados al primer uso y descartados al salir del guild,
+    así la memoria crece con los guilds activos y no con los históricos."""
+
+    def __init__(self, store: Balances, defaults: GuildConfig):
+        self._store = store
+        self.defaults = defaults
+        self._states: Dict[int, GuildState] = {}
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def __iter__(self) -> Iterator[GuildState]:
+        return iter(list(self._states.values()))
+
+    def get(self, guild_id: int) -> GuildState:
+        state = self._states.get(guild_id)
+        if state is None:
+            state = self._states[guild_id] = GuildState(guild_id, self._store)
+        return state
+
+    def peek(self, guild_id: int) -> Optional[GuildState]:
+        """Estado del guild sin crearlo."""
+        return self._states.get(guild_id)
+
+    async def queue(self, guild_id: int) -> ApprovalQueue:
+        """Cola de aprobación del guild, cargada desde la base de datos la primera vez."""
+        return await self.get(guild_id).queue.ready()
+
+    # ------------------ CONFIGURACIÓN ------------------
+    async def config(self, guild_id: int) -> GuildConfig:
+        """Configuración del guild; se lee de la base de datos solo la primera vez."""
+        state = self.get(guild_id)
+        if state.config is None:
+            await self.reload_config(guild_id)
+        return state.config
+
+    def cached_config(self, guild_id: int) -> GuildConfig:
+        """Configuración ya cargada (o la por defecto), sin tocar la base de datos."""
+        state = self._states.get(guild_id)
+        return state.config if state is not None and state.config is not None else self.defaults
+
+    async def reload_config(self, guild_id: int) -> GuildConfig:
+        """Vuelve a leer la configuración (p. ej. si otro proceso la cambió)."""
+        overrides = await self._store.run(Database.guild_config, guild_id)
+        config = self.defaults.merged(overrides)
+        self.get(guild_id).config = config
+        return config
+
+    async def set_config(self, guild_id: int, key: str, value) -> GuildConfig:
+        """Guarda una clave (None vuelve al valor por defecto) y la aplica en caliente."""
+        raw = None if value is None else json.dumps(value)
+        await self._store.run(Database.set_guild_config, guild_id, key, raw)
+        return await self.reload_config(guild_id)
+
+    def evict(self, guild_id: int) -> Optional[GuildState]:
+        return self._states.pop(guild_id, None)
@@ -0,0 +1,128 @@
+import asyncio
+import math
+import time
+from typing import Callable, List, Optional, Tuple
+
+import discord
+from aiohttp import web
+
+from store import Balances
+
+# Segundos entre mediciones del retraso del event loop
+LAG_PROBE_INTERVAL = 1.0
+
+
+class HealthServer:
+    """Servidor HTTP en el mismo event loop del bot (sin hilos ni Flask).
+
+    - `/`        responde "Bot activo ✅" para los pings de keep-alive.
+    - `/healthz` 200 si el gateway está conectado, el loop responde a tiempo
+                 y la base de datos contesta; 503 con el detalle si no.
+    - `/metrics` métricas en formato de texto de Prometheus.
+    """
+
+    def __init__(self, bot: discord.Client, store: Balances, host: str = "0.0.0.0",
+                 port: int = 8080, max_loop_lag: float = 1.0, db_timeout: float = 2.0):
+        self.bot = bot
+        self.store = store
+        self.host = host
+        self.port = port
+        self.max_loop_lag = max_loop_lag
+        self.db_timeout = db_timeout
+        self.loop_lag = 0.0
+        self.started_at = time.time()
+        self._gauges: List[Tuple[str, str, Callable[[], float]]] = []
+        self._collectors: List[Callable[[], str]] = []
+        self._runner: Optional[web.AppRunner] = None
+        self._probe: Optional[asyncio.Task] = None
+
+        self.gauge("bot_uptime_seconds", "Segundos desde que arrancó el proceso",
+                   lambda: time.time() - self.started_at)
+        self.gauge("bot_event_loop_lag_seconds", "Retraso medido del event loop", lambda: self.loop_lag)
+        self.gauge("bot_gateway_latency_seconds", "Latencia del heartbeat del gateway", lambda: self.bot.latency)
+        self.gauge("bot_gateway_connected", "1 si el gateway está conectado", lambda: float(self.gateway_connected()))
+        self.gauge("bot_guilds", "Servidores en los que está el bot", lambda: len(self.bot.guilds))
+
+    def gauge(self, name: str, help_text: str, fn: Callable[[], float]):
+        """Registra un valor que se publica en /metrics en cada consulta."""
+        self._gauges.append((name, help_text, fn))
+
+    def collector(self, fn: Callable[[], str]):
+        """Registra una función que devuelve texto de Prometheus ya formateado."""
+        self._collectors.append(fn)
+
+    # ------------------ COMPROBACIONES ------------------
+    def gateway_connected(self) -> bool:
+        return self.bot.is_ready() and not self.bot.is_closed() and math.isfinite(self.bot.latency)
+
+    async def _measure_lag(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(LAG_PROBE_INTERVAL)
+            self.loop_lag = max(0.0, loop.time() - start - LAG_PROBE_INTERVAL)
+
+    async def _db_reachable(self) -> bool:
+        try:
+            await asyncio.wait_for(
+                self.store.run(lambda db: db.connection().execute("SELECT 1").fetchone()),
+                self.db_timeout)
+            return True
+        except Exception as e:
+            print("Healthcheck: base de datos no disponible:", e)
+            return False
+
+    # ------------------ RUTAS ------------------
+    async def _home(self, request: web.Request) -> web.Response:
+        return web.Response(text="Bot activo ✅")
+
+    async def _healthz(self, request: web.Request) -> web.Response:
+        checks = {
+            "gateway": self.gateway_connected(),
+            "event_loop": self.loop_lag < self.max_loop_lag,
+            "database": await self._db_reachable(),
+        }
+        body = {
+            "status": "ok" if all(checks.values()) else "error",
+            "checks": checks,
+            "loop_lag_seconds": round(self.loop_lag, 4),
+            "gateway_latency_seconds": self.bot.latency if math.isfinite(self.bot.latency) else None,
+        }
+        return web.json_response(body, status=200 if all(checks.values()) else 503)
+
+    def render_metrics(self) -> str:
+        lines: List[str] = []
+        for name, help_text, fn in self._gauges:
+            try:
+                value = float(fn())
+            except Exception:
+                continue
+            if math.isnan(value):
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n" + "".join(fn() for fn in self._collectors)
+
+    async def _metrics(self, request: web.Request) -> web.Response:
+        return web.Response(text=self.render_metrics(), content_type="text/plain", charset="utf-8")
+
+    # ------------------ CICLO DE VIDA ------------------
+    async def start(self):
+        app = web.Application()
+        app.add_routes([web.get("/", self._home),
+                        web.get("/healthz", self._healthz),
+                        web.get("/metrics", self._metrics)])
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        self._probe = asyncio.ensure_future(self._measure_lag())
+
+    async def aclose(self):
+        if self._probe is not None:
+            self._probe.cancel()
+            self._probe = None
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
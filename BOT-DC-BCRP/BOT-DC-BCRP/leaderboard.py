@@ -0,0 +1,103 @@
+import asyncio
+import hashlib
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+BALANCES_TITLE = "📊 Balances del Gremio"
+PAGE_SIZE = 50
+
+
+# ------------------ RENDER DE PÁGINAS ------------------
+def render_balance_pages(rows: Sequence[Any], page_size: int = PAGE_SIZE) -> List[Tuple[str, str]]:
+    """Convierte filas (user_id, balance) en páginas (título, descripción)."""
+    if not rows:
+        return [(BALANCES_TITLE, "No hay datos aún.")]
+    pages = []
+    for start in range(0, len(rows), page_size):
+        chunk = rows[start:start + page_size]
+        lines = [
+            f"**{i + 1}.** <@{row['user_id']}> — {int(row['balance']):,} silver"
+            for i, row in enumerate(chunk, start=start)
+        ]
+        pages.append((f"{BALANCES_TITLE} (página {start // page_size + 1})", "\n".join(lines)))
+    return pages
+
+
+def page_hash(title: str, description: str) -> str:
+    """Huella del contenido de una página (sin el footer con la hora)."""
+    return hashlib.sha1(f"{title}\n{description}".encode("utf-8")).hexdigest()
+
+
+# ------------------ REFRESCO AGRUPADO ------------------
+class RefreshScheduler:
+    """Agrupa ráfagas de peticiones de refresco en una sola ejecución por clave.
+
+    La primera petición programa `callback(*args)` tras `window` segundos; las
+    que llegan mientras tanto solo actualizan los argumentos. Si llegan durante
+    la ejecución, se programa una pasada más al terminar.
+    """
+
+    def __init__(self, callback: Callable[..., Awaitable[Any]], window: float):
+        self.callback = callback
+        self.window = window
+        self._args: Dict[Hashable, tuple] = {}
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+
+    def schedule(self, key: Hashable, *args):
+        self._args[key] = args
+        task = self._tasks.get(key)
+        if task is None or task.done():
+            self._tasks[key] = asyncio.ensure_future(self._run(key))
+
+    def cancel(self, key: Hashable):
+        """Descarta el refresco pendiente de `key` (p. ej. al salir de un guild)."""
+        self._args.pop(key, None)
+        task = self._tasks.pop(key, None)
+        if task is not None:
+            task.cancel()
+
+    async def _run(self, key: Hashable):
+        while key in self._args:
+            await asyncio.sleep(self.window)
+            args = self._args.pop(key)
+            try:
+                await self.callback(*args)
+            except Exception as e:
+                print(f"Error en refresco programado ({key}):", e)
+        self._tasks.pop(key, None)
+
+
+# ------------------ TOP PAGINADO ------------------
+Cursor = Optional[Tuple[int, int]]  # (balance, user_id) de la última fila de la página anterior
+
+
+class TopSnapshot:
+    """Páginas del ranking de un guild compartidas durante `ttl` segundos.
+
+    Cada página se pide con `fetch(after, limit)` (cursor por clave, sin
+    OFFSET) la primera vez; quien pida la misma página mientras dure la foto,
+    o mientras la consulta siga en curso, recibe el mismo resultado.
+    """
+
+    def __init__(self, fetch: Callable[[Cursor, int], Awaitable[List[Any]]], ttl: float):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.expires = 0.0
+        self._pages: Dict[Tuple[Cursor, int], asyncio.Future] = {}
+
+    async def page(self, after: Cursor, limit: int) -> List[Any]:
+        now = time.monotonic()
+        if now >= self.expires:
+            self._pages.clear()
+            self.expires = now + self.ttl
+        key = (after, limit)
+        future = self._pages.get(key)
+        if future is None:
+            future = self._pages[key] = asyncio.ensure_future(self.fetch(after, limit))
+        try:
+            # shield: si se cancela quien espera, los demás siguen esperando la misma consulta
+            return await asyncio.shield(future)
+        except Exception:
+            if self._pages.get(key) is future:
+                del self._pages[key]
+            raise
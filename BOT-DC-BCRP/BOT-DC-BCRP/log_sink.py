@@ -0,0 +1,104 @@
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+
+MESSAGE_LIMIT = 2000
+
+
+def chunk_lines(lines: List[str], limit: int = MESSAGE_LIMIT) -> List[str]:
+    """Agrupa líneas en mensajes de como máximo `limit` caracteres."""
+    messages: List[str] = []
+    current: List[str] = []
+    size = 0
+    for line in lines:
+        if len(line) > limit:
+            line = line[:limit - 1] + "…"
+        extra = len(line) + (1 if current else 0)
+        if current and size + extra > limit:
+            messages.append("\n".join(current))
+            current, size = [], 0
+            extra = len(line)
+        current.append(line)
+        size += extra
+    if current:
+        messages.append("\n".join(current))
+    return messages
+
+
+class LogSink:
+    """Envía los logs a Discord en segundo plano y en lotes.
+
+    `put` nunca bloquea: encola la línea (si la cola está llena se descarta la
+    más antigua) y una tarea junta todo lo que llega durante `flush_interval`
+    en unos pocos mensajes por canal, respetando el límite de 2000 caracteres.
+    """
+
+    def __init__(self, flush_interval: float = 2.0, max_queue: int = 1000):
+        self.flush_interval = flush_interval
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._worker: Optional[asyncio.Task] = None
+        self._batch: List[Tuple[Any, str]] = []  # lote que la tarea está juntando/enviando
+        self._sending = False
+        self._closing = False
+        self.dropped = 0
+
+    def put(self, channel: Any, text: str):
+        """Encola `text` para `channel` (cualquier objeto con `send`)."""
+        if self._queue.full():
+            self._queue.get_nowait()
+            self.dropped += 1
+        self._queue.put_nowait((channel, text))
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.ensure_future(self._run())
+
+    def _drain(self) -> List[Tuple[Any, str]]:
+        items = []
+        while not self._queue.empty():
+            items.append(self._queue.get_nowait())
+        return items
+
+    async def _send(self, items: List[Tuple[Any, str]]):
+        by_channel: Dict[int, Tuple[Any, List[str]]] = {}
+        for channel, text in items:
+            by_channel.setdefault(id(channel), (channel, []))[1].append(text)
+        for channel, lines in by_channel.values():
+            for content in chunk_lines(lines):
+                try:
+                    await channel.send(content)
+                except Exception as e:
+                    print("Error enviando log:", e)
+
+    async def _run(self):
+        while True:
+            self._batch = [await self._queue.get()]
+            # Esperar un poco para juntar la ráfaga en pocos mensajes
+            await asyncio.sleep(self.flush_interval)
+            self._batch += self._drain()
+            self._sending = True
+            try:
+                await self._send(self._batch)
+            finally:
+                self._batch = []
+                self._sending = False
+            if self._closing:
+                return
+
+    async def aclose(self):
+        """Envía lo que quede en cola y detiene la tarea de fondo.
+
+        Si la tarea está enviando un lote se la deja terminar (cancelarla y
+        reenviar el lote duplicaría los mensajes ya enviados); si solo está
+        juntando líneas se cancela y su lote se envía aquí.
+        """
+        self._closing = True
+        worker, self._worker = self._worker, None
+        if worker is not None and not worker.done():
+            if self._sending:
+                await worker
+            else:
+                worker.cancel()
+                try:
+                    await worker
+                except asyncio.CancelledError:
+                    pass
+        batch, self._batch = self._batch, []
+        await self._send(batch + self._drain())
@@ -0,0 +1,262 @@
+"""Copias de seguridad en caliente y mantenimiento periódico de la base de datos.
+
+Las copias usan la API de backup de SQLite desde una conexión propia en otro
+hilo: copian por pasos de pocas páginas y sueltan el bloqueo entre pasos, así
+los comandos siguen escribiendo. Cada copia se escribe en un .tmp, se verifica
+con quick_check/integrity_check y solo entonces entra en la rotación.
+
+    python maintenance.py backup
+    python maintenance.py list
+    python maintenance.py check backups/balances-20261018-120000.db [--full]
+    python maintenance.py restore backups/balances-20261018-120000.db   (con el bot detenido)
+"""
+import argparse
+import asyncio
+import os
+import sqlite3
+import sys
+import time
+from typing import List, Optional, Tuple
+
+from db import DB_PATH, Database
+from metrics import registry as metrics
+from store import Balances
+
+# ------------------ CONFIG ------------------
+BACKUP_DIR = os.getenv("BACKUP_DIR", "backups")
+# Segundos entre copias (0 desactiva la tarea del bot)
+BACKUP_INTERVAL = float(os.getenv("BACKUP_INTERVAL", "21600"))
+BACKUP_KEEP = int(os.getenv("BACKUP_KEEP", "8"))
+# Páginas por paso y pausa entre pasos: cuanto más chico el paso, menos espera un escritor
+BACKUP_PAGES = int(os.getenv("BACKUP_PAGES", "256"))
+BACKUP_SLEEP = float(os.getenv("BACKUP_SLEEP", "0.01"))
+# integrity_check completo cada N copias; quick_check en las demás
+INTEGRITY_EVERY = int(os.getenv("INTEGRITY_EVERY", "4"))
+
+# Si otra conexión escribe durante la copia por pasos, SQLite la reinicia desde
+# cero; con escrituras constantes nunca terminaría. Tras estos reinicios se copia
+# en un solo paso: en modo WAL es una lectura que no bloquea a los escritores.
+BACKUP_MAX_RESTARTS = 3
+SNAPSHOT_PREFIX = "balances-"
+
+
+class _Restarted(Exception):
+    pass
+
+
+# ------------------ COPIAS ------------------
+def backup_to(source: str, target: str, pages: int = BACKUP_PAGES, sleep: float = BACKUP_SLEEP,
+              verify: bool = True, full: bool = False) -> int:
+    """Copia `source` en `target` y devuelve cuántas veces se reinició la copia.
+
+    La copia se escribe en un .tmp y con `verify` se revisa ahí (quick_check, o
+    integrity_check si `full`); solo si da "ok" pasa al nombre final con
+    os.replace, así nunca queda en la rotación una copia sin verificar o a
+    medias. Si falla se aparta como `<target>.bad` y se lanza ValueError.
+    """
+    tmp = target + ".tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    restarts = 0
+    copied = -1
+
+    def progress(status, remaining, total):
+        nonlocal restarts, copied
+        if total - remaining < copied:
+            restarts += 1
+            if restarts >= BACKUP_MAX_RESTARTS:
+                raise _Restarted()
+        copied = total - remaining
+
+    src = sqlite3.connect(source)
+    dst = sqlite3.connect(tmp)
+    try:
+        try:
+            src.backup(dst, pages=pages, progress=progress, sleep=sleep)
+        except _Restarted:
+            src.backup(dst, pages=-1)
+        # Copia de un solo archivo: sin -wal/-shm que se queden con el nombre del .tmp
+        dst.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        dst.close()
+        src.close()
+    if verify:
+        result = check(tmp, full)
+        if result != "ok":
+            os.replace(tmp, target + ".bad")
+            raise ValueError(f"La copia {target} no pasó {'integrity_check' if full else 'quick_check'}: {result}")
+    os.replace(tmp, target)
+    return restarts
+
+
+def check(path: str, full: bool = False) -> str:
+    """"ok" o los problemas que reporta SQLite (integrity_check si `full`, si no quick_check)."""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        rows = conn.execute("PRAGMA integrity_check" if full else "PRAGMA quick_check").fetchall()
+    except sqlite3.DatabaseError as e:
+        return str(e)
+    finally:
+        conn.close()
+    return "; ".join(str(row[0]) for row in rows)
+
+
+def snapshots(directory: str = BACKUP_DIR) -> List[str]:
+    """Copias verificadas, de la más vieja a la más nueva (el nombre lleva la fecha)."""
+    if not os.path.isdir(directory):
+        return []
+    names = sorted(n for n in os.listdir(directory) if n.startswith(SNAPSHOT_PREFIX) and n.endswith(".db"))
+    return [os.path.join(directory, n) for n in names]
+
+
+def rotate(directory: str = BACKUP_DIR, keep: int = BACKUP_KEEP) -> List[str]:
+    """Borra las copias más viejas y deja las últimas `keep`; devuelve las borradas."""
+    old = snapshots(directory)[:-keep] if keep > 0 else []
+    for path in old:
+        os.remove(path)
+    return old
+
+
+def snapshot_path(directory: str = BACKUP_DIR) -> str:
+    return os.path.join(directory, time.strftime(f"{SNAPSHOT_PREFIX}%Y%m%d-%H%M%S.db"))
+
+
+def restore(snapshot: str, target: str = DB_PATH) -> Optional[str]:
+    """Reemplaza `target` por `snapshot`, con el bot detenido.
+
+    La copia se verifica antes; la base actual se guarda al lado como
+    `<target>.before-restore-<fecha>` (ese camino se devuelve) y el contenido
+    se escribe con la API de backup, que respeta el WAL de `target`.
+    """
+    result = check(snapshot, full=True)
+    if result != "ok":
+        raise ValueError(f"La copia {snapshot} no pasó integrity_check: {result}")
+    saved = None
+    if os.path.exists(target):
+        saved = f"{target}.before-restore-{time.strftime('%Y%m%d-%H%M%S')}"
+        # Se guarda tal cual, aunque esté dañada: suele ser la razón de restaurar
+        backup_to(target, saved, verify=False)
+    src = sqlite3.connect(f"file:{snapshot}?mode=ro", uri=True)
+    dst = sqlite3.connect(target)
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+    result = check(target, full=True)
+    if result != "ok":
+        raise ValueError(f"La base restaurada no pasó integrity_check: {result}")
+    return saved
+
+
+# ------------------ TAREA DEL BOT ------------------
+class Maintenance:
+    """Copia, verifica y rota cada `interval` segundos, y después actualiza las
+    estadísticas del planificador (ANALYZE / PRAGMA optimize).
+
+    Copia y verificación corren en un hilo aparte con conexiones propias, no en
+    el hilo de la base de datos del bot; solo `optimize` pasa por él.
+    """
+
+    def __init__(self, store: Balances, directory: str = BACKUP_DIR, interval: float = BACKUP_INTERVAL,
+                 keep: int = BACKUP_KEEP):
+        self.store = store
+        self.directory = directory
+        self.interval = interval
+        self.keep = keep
+        self.runs = 0
+        self.last_backup_at = 0.0
+        self.last_ok = True
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.ensure_future(self._loop())
+
+    async def aclose(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception as e:
+                print("Error en el mantenimiento de la base de datos:", e)
+
+    @metrics.timed("task", "maintenance")
+    async def run_once(self) -> Tuple[str, str]:
+        """Una pasada completa; devuelve (ruta de la copia, resultado de la verificación)."""
+        os.makedirs(self.directory, exist_ok=True)
+        # Los cambios en memoria (modo batched) tienen que estar en la copia
+        await self.store.flush()
+        path = snapshot_path(self.directory)
+        full = INTEGRITY_EVERY > 0 and self.runs % INTEGRITY_EVERY == 0
+        self.runs += 1
+        try:
+            # Se verifica antes de tomar el nombre final; si falla queda apartada como .bad
+            restarts = await asyncio.to_thread(backup_to, self.store.db.path, path, full=full)
+        except ValueError as e:
+            self.last_ok = False
+            print(f"❌ {e}")
+            return path + ".bad", str(e)
+        self.last_ok = True
+        self.last_backup_at = time.time()
+        await self.store.run(Database.optimize)
+        removed = await asyncio.to_thread(rotate, self.directory, self.keep)
+        print(f"💾 Copia {path} verificada ({'integrity' if full else 'quick'}_check, "
+              f"{restarts} reinicios), {len(removed)} copias viejas borradas")
+        return path, "ok"
+
+
+# ------------------ CLI ------------------
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=DB_PATH, help=f"base de datos (por defecto {DB_PATH})")
+    parser.add_argument("--dir", default=BACKUP_DIR, help=f"carpeta de copias (por defecto {BACKUP_DIR})")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("backup", help="copiar, verificar y rotar ahora")
+    sub.add_parser("list", help="listar las copias")
+    checker = sub.add_parser("check", help="verificar una copia (o la base)")
+    checker.add_argument("path")
+    checker.add_argument("--full", action="store_true", help="integrity_check completo")
+    restorer = sub.add_parser("restore", help="reemplazar la base por una copia (bot detenido)")
+    restorer.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "backup":
+        os.makedirs(args.dir, exist_ok=True)
+        path = snapshot_path(args.dir)
+        try:
+            restarts = backup_to(args.db, path, full=True)
+        except ValueError as e:
+            sys.exit(f"❌ {e}")
+        removed = rotate(args.dir, BACKUP_KEEP)
+        print(f"💾 {path} ({restarts} reinicios, {len(removed)} copias viejas borradas)")
+
+    elif args.command == "list":
+        for path in snapshots(args.dir):
+            print(f"{path}  {os.path.getsize(path):,} bytes")
+
+    elif args.command == "check":
+        result = check(args.path, args.full)
+        print(result)
+        if result != "ok":
+            sys.exit(1)
+
+    else:
+        try:
+            saved = restore(args.path, args.db)
+        except ValueError as e:
+            sys.exit(f"❌ {e}")
+        print(f"♻️ {args.db} restaurada desde {args.path}" + (f" (anterior guardada en {saved})" if saved else ""))
+
+
+if __name__ == "__main__":
+    main()
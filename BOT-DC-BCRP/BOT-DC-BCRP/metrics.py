@@ -0,0 +1,180 @@
+import functools
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+import aiohttp
+import discord
+from discord import app_commands
+
+# Límites de los buckets (segundos) de los histogramas de Prometheus
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Ventana de las muestras crudas para los percentiles de /stats
+WINDOW_SECONDS = 3600
+# Muestras guardadas por serie como máximo (acota la memoria en picos de tráfico)
+MAX_SAMPLES = 20000
+
+# Familias: nombre de la métrica y de su etiqueta
+FAMILIES = {
+    "command": ("bot_command_seconds", "command", "Duración de los comandos slash"),
+    "event": ("bot_event_seconds", "event", "Duración de los manejadores de eventos"),
+    "task": ("bot_task_seconds", "task", "Duración de tareas internas (mensajes fijos)"),
+    "db": ("bot_db_seconds", "op", "Tiempo en el hilo de SQLite por función"),
+    "discord": ("bot_discord_api_seconds", "route", "Duración de las llamadas HTTP a la API de Discord"),
+}
+
+# IDs numéricos y tokens de interacción en las rutas de la API, para agrupar
+_ROUTE_ID = re.compile(r"/\d+(?=/|$)")
+_ROUTE_TOKEN = re.compile(r"(/interactions/\{id\}|/webhooks/\{id\})/[^/]+")
+
+
+class _Series:
+    __slots__ = ("buckets", "count", "total", "samples")
+
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.samples: Deque[Tuple[float, float]] = deque(maxlen=MAX_SAMPLES)
+
+
+class Metrics:
+    """Histogramas de latencia por (familia, nombre).
+
+    Cada observación suma a los buckets acumulados (exportados en /metrics)
+    y guarda la muestra cruda con su hora para calcular percentiles de la
+    última hora en /stats. Se puede observar desde cualquier hilo.
+    """
+
+    def __init__(self):
+        self._series: Dict[Tuple[str, str], _Series] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, family: str, name: str, seconds: float):
+        now = time.time()
+        with self._lock:
+            series = self._series.get((family, name))
+            if series is None:
+                series = self._series[(family, name)] = _Series()
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    series.buckets[i] += 1
+            series.count += 1
+            series.total += seconds
+            series.samples.append((now, seconds))
+
+    @contextmanager
+    def timer(self, family: str, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(family, name, time.perf_counter() - start)
+
+    def timed(self, family: str, name: Optional[str] = None):
+        """Decorador para corutinas; por defecto usa el nombre de la función."""
+        def decorator(fn: Callable[..., Any]):
+            label = name or fn.__name__
+
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                with self.timer(family, label):
+                    return await fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    # ------------------ LECTURA ------------------
+    def percentiles(self, window: float = WINDOW_SECONDS) -> List[Tuple[str, str, int, float, float, float]]:
+        """(familia, nombre, muestras, p50, p95, p99) de la última `window` en segundos."""
+        cutoff = time.time() - window
+        with self._lock:
+            snapshot = [(key, [s for t, s in series.samples if t >= cutoff])
+                        for key, series in self._series.items()]
+        rows = []
+        for (family, name), samples in snapshot:
+            if not samples:
+                continue
+            samples.sort()
+            last = len(samples) - 1
+            rows.append((family, name, len(samples),
+                         samples[int(last * 0.50)], samples[int(last * 0.95)], samples[int(last * 0.99)]))
+        return rows
+
+    def render_prometheus(self) -> str:
+        with self._lock:
+            snapshot = [(key, list(series.buckets), series.count, series.total)
+                        for key, series in sorted(self._series.items())]
+        lines: List[str] = []
+        announced = set()
+        for (family, name), buckets, count, total in snapshot:
+            metric, label, help_text = FAMILIES.get(family, (f"bot_{family}_seconds", "name", family))
+            if metric not in announced:
+                announced.add(metric)
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} histogram")
+            value = name.replace("\\", "\\\\").replace('"', '\\"')
+            for bound, bucket in zip(BUCKETS, buckets):
+                lines.append(f'{metric}_bucket{{{label}="{value}",le="{bound}"}} {bucket}')
+            lines.append(f'{metric}_bucket{{{label}="{value}",le="+Inf"}} {count}')
+            lines.append(f'{metric}_sum{{{label}="{value}"}} {total}')
+            lines.append(f'{metric}_count{{{label}="{value}"}} {count}')
+        return "\n".join(lines) + "\n" if lines else ""
+
+
+registry = Metrics()
+
+
+# ------------------ DISCORD ------------------
+def route_name(method: str, path: str) -> str:
+    """"PATCH /channels/123/messages/456" -> "PATCH /channels/{id}/messages/{id}"."""
+    if path.startswith("/api/v"):
+        path = "/" + path.split("/", 3)[-1]
+    path = _ROUTE_TOKEN.sub(r"\1/{token}", _ROUTE_ID.sub("/{id}", path))
+    return f"{method} {path}"
+
+
+def discord_http_trace(metrics: Metrics = registry) -> aiohttp.TraceConfig:
+    """TraceConfig de aiohttp para `discord.Client(http_trace=...)`: mide cada
+    llamada a la API REST de Discord agrupada por ruta."""
+    trace = aiohttp.TraceConfig()
+
+    async def on_start(session, ctx, params):
+        ctx.started = time.perf_counter()
+
+    async def on_end(session, ctx, params):
+        started = getattr(ctx, "started", None)
+        if started is not None:
+            metrics.observe("discord", route_name(params.method, params.url.path), time.perf_counter() - started)
+
+    trace.on_request_start.append(on_start)
+    trace.on_request_end.append(on_end)
+    trace.on_request_exception.append(on_end)
+    return trace
+
+
+class InstrumentedTree(app_commands.CommandTree):
+    """CommandTree que mide cada comando slash, haya terminado bien o con error."""
+
+    def __init__(self, *args, metrics: Metrics = registry, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = metrics
+        self.client.add_listener(self._completed, "on_app_command_completion")
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        interaction.extras["started"] = time.perf_counter()
+        return True
+
+    def _observe(self, interaction: discord.Interaction):
+        started = interaction.extras.pop("started", None)
+        if started is not None and interaction.command is not None:
+            self.metrics.observe("command", interaction.command.qualified_name, time.perf_counter() - started)
+
+    async def _completed(self, interaction: discord.Interaction, command):
+        self._observe(interaction)
+
+    async def on_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError):
+        self._observe(interaction)
+        await super().on_error(interaction, error)
@@ -0,0 +1,334 @@
+import asyncio
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from db import Database, LedgerEntry, get_db
+from metrics import registry as metrics
+
+# ------------------ CONFIG ------------------
+# "strict": cada cambio se confirma en disco antes de responder (los cambios
+#           concurrentes comparten la misma transacción).
+# "batched": los cambios se agrupan y se escriben cada BALANCE_FLUSH_INTERVAL
+#            segundos y al apagar el bot; una caída puede perder ese intervalo.
+BALANCE_DURABILITY = os.getenv("BALANCE_DURABILITY", "strict")
+BALANCE_FLUSH_INTERVAL = float(os.getenv("BALANCE_FLUSH_INTERVAL", "1.0"))
+
+
+class Balances:
+    """API asíncrona de balances.
+
+    Todas las consultas se ejecutan en un hilo dedicado a SQLite, así un disco
+    lento nunca bloquea el event loop de discord.py (heartbeats, interacciones).
+    Los balances de cada servidor se cargan una vez en memoria y las lecturas
+    se sirven desde ahí; las escrituras se acumulan y se vuelcan agrupadas.
+    """
+
+    def __init__(self, database: Optional[Database] = None,
+                 durability: str = BALANCE_DURABILITY,
+                 flush_interval: float = BALANCE_FLUSH_INTERVAL):
+        if durability not in ("strict", "batched"):
+            raise ValueError(f"durabilidad desconocida: {durability}")
+        self._db = database
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db")
+        self.durability = durability
+        self.flush_interval = flush_interval
+        self._cache: Dict[int, Dict[int, int]] = {}
+        self._loading: Dict[int, asyncio.Future] = {}
+        self._dirty: Dict[Tuple[int, int], int] = {}
+        self._ledger: List[LedgerEntry] = []
+        self._committed: Optional[asyncio.Future] = None  # se resuelve al confirmar `_dirty`
+        self._flush_lock = asyncio.Lock()
+        self._flusher: Optional[asyncio.Task] = None
+
+    @property
+    def db(self) -> Database:
+        if self._db is None:
+            self._db = get_db()
+        return self._db
+
+    async def run(self, fn: Callable[..., Any], *args) -> Any:
+        """Ejecuta `fn(database, *args)` en el hilo de la base de datos.
+
+        El tiempo dentro del hilo queda en la métrica "db" con el nombre de `fn`.
+        """
+        loop = asyncio.get_running_loop()
+        name = getattr(fn, "__name__", "sql")
+
+        def call():
+            with metrics.timer("db", name):
+                return fn(self.db, *args)
+        return await loop.run_in_executor(self._executor, call)
+
+    # ------------------ CACHÉ EN MEMORIA ------------------
+    async def _guild(self, guild_id: int) -> Dict[int, int]:
+        """Mapa {user_id: balance} del servidor, cargado desde disco una sola vez."""
+        cached = self._cache.get(guild_id)
+        if cached is not None:
+            return cached
+        loader = self._loading.get(guild_id)
+        if loader is None:
+            loader = asyncio.ensure_future(self.run(Database.guild_balances, guild_id))
+            self._loading[guild_id] = loader
+        try:
+            rows = await loader
+        finally:
+            self._loading.pop(guild_id, None)
+        return self._cache.setdefault(guild_id, rows)
+
+    async def _write(self, values: Dict[Tuple[int, int], int], ledger: Sequence[LedgerEntry] = ()):
+        """Registra los nuevos valores y sus movimientos de ledger; en modo strict
+        espera a que estén en disco.
+
+        En modo strict un error significa que nada cambió: si la transacción que
+        llevaba este cambio falla, se deshace en memoria y se propaga el error.
+        """
+        self._dirty.update(values)
+        self._ledger.extend(ledger)
+        if self.durability == "strict":
+            if self._committed is None:
+                self._committed = asyncio.get_running_loop().create_future()
+            committed = self._committed
+            try:
+                await self.flush()
+            except Exception:
+                pass  # el resultado del lote que llevaba este cambio llega por `committed`
+            await asyncio.shield(committed)
+        elif self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.ensure_future(self._flush_loop())
+
+    async def flush(self):
+        """Vuelca todos los cambios pendientes en una sola transacción."""
+        async with self._flush_lock:
+            await self._flush_locked()
+
+    async def _flush_locked(self):
+        if not self._dirty and not self._ledger:
+            return
+        batch, self._dirty = self._dirty, {}
+        ledger, self._ledger = self._ledger, []
+        committed, self._committed = self._committed, None
+        items = [(g, u, v) for (g, u), v in batch.items()]
+        write = asyncio.ensure_future(self.run(Database.write_balances, items, ledger))
+        write.add_done_callback(lambda f: self._written(f, batch, ledger, committed))
+        # Si se cancela quien espera, la escritura sigue en el hilo de la base de datos
+        await asyncio.shield(write)
+
+    def _written(self, write: asyncio.Future, batch: Dict[Tuple[int, int], int],
+                 ledger: List[LedgerEntry], committed: Optional[asyncio.Future]):
+        """Avisa a quienes esperan el lote y, si la transacción falló (rollback),
+        lo devuelve a la cola (batched) o deshace sus cambios en memoria (strict)."""
+        failed = write.cancelled() or write.exception() is not None
+        if committed is not None and not committed.done():
+            if write.cancelled():
+                committed.cancel()
+            elif failed:
+                committed.set_exception(write.exception())
+                committed.exception()  # lo reciben los que esperan; sin aviso si nadie espera
+            else:
+                committed.set_result(None)
+        if not failed:
+            return
+        if self.durability == "strict":
+            self._undo(ledger)
+            return
+        for key, value in batch.items():
+            self._dirty.setdefault(key, value)  # sin pisar valores más nuevos
+        self._ledger[:0] = ledger
+
+    def _undo(self, ledger: List[LedgerEntry]):
+        """Resta de la memoria los movimientos de un lote que no llegó a disco.
+
+        Los cambios encolados después ya contaban con esos movimientos: sus
+        valores y sus filas de ledger se corrigen igual.
+        """
+        deltas: Dict[Tuple[int, int], int] = {}
+        for guild_id, user_id, delta, *_ in ledger:
+            deltas[(guild_id, user_id)] = deltas.get((guild_id, user_id), 0) + delta
+        for (guild_id, user_id), delta in deltas.items():
+            balances = self._cache.get(guild_id)
+            if balances is not None and user_id in balances:
+                balances[user_id] -= delta
+            if (guild_id, user_id) in self._dirty:
+                self._dirty[(guild_id, user_id)] -= delta
+        self._ledger = [
+            (g, u, d, after - deltas.get((g, u), 0), kind, actor, note, at)
+            for g, u, d, after, kind, actor, note, at in self._ledger
+        ]
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                print("Error volcando balances:", e)
+
+    @staticmethod
+    def _stage(guild_id: int, balances: Dict[int, int], new_values: Dict[int, int],
+               kind: str, actor_id: Optional[int], note: str,
+               values: Dict[Tuple[int, int], int], ledger: List[LedgerEntry]):
+        """Aplica los balances nuevos en memoria y prepara sus filas de ledger."""
+        now = int(time.time())
+        for user_id, new_balance in new_values.items():
+            delta = new_balance - balances.get(user_id, 0)
+            balances[user_id] = new_balance
+            values[(guild_id, user_id)] = new_balance
+            if delta:
+                ledger.append((guild_id, user_id, delta, new_balance, kind, actor_id, note, now))
+
+    # ------------------ API ------------------
+    # Cada mutación deja su movimiento en el ledger (`kind`, `actor_id`, `note`)
+    # dentro de la misma transacción que el balance.
+    async def get(self, guild_id: int, user_id: int) -> int:
+        return (await self._guild(guild_id)).get(user_id, 0)
+
+    async def set(self, guild_id: int, user_id: int, amount: int, *,
+                  kind: str = "ajuste", actor_id: Optional[int] = None, note: str = ""):
+        balances = await self._guild(guild_id)
+        values: Dict[Tuple[int, int], int] = {}
+        ledger: List[LedgerEntry] = []
+        self._stage(guild_id, balances, {user_id: amount}, kind, actor_id, note, values, ledger)
+        await self._write(values, ledger)
+
+    async def add(self, guild_id: int, user_id: int, amount: int, *,
+                  kind: str = "ajuste", actor_id: Optional[int] = None, note: str = "") -> int:
+        balances = await self._guild(guild_id)
+        if amount <= 0:
+            return balances.get(user_id, 0)
+        new_balance = balances.get(user_id, 0) + amount
+        values: Dict[Tuple[int, int], int] = {}
+        ledger: List[LedgerEntry] = []
+        self._stage(guild_id, balances, {user_id: new_balance}, kind, actor_id, note, values, ledger)
+        await self._write(values, ledger)
+        return new_balance
+
+    async def remove(self, guild_id: int, user_id: int, amount: int, *,
+                     kind: str = "ajuste", actor_id: Optional[int] = None, note: str = "") -> int:
+        balances = await self._guild(guild_id)
+        if user_id not in balances or amount <= 0:
+            return balances.get(user_id, 0)
+        new_balance = max(balances[user_id] - amount, 0)
+        values: Dict[Tuple[int, int], int] = {}
+        ledger: List[LedgerEntry] = []
+        self._stage(guild_id, balances, {user_id: new_balance}, kind, actor_id, note, values, ledger)
+        await self._write(values, ledger)
+        return new_balance
+
+    async def add_many(self, guild_id: int, changes: Iterable[Tuple[int, int]], *,
+                       kind: str = "ajuste", actor_id: Optional[int] = None,
+                       note: str = "") -> Dict[int, int]:
+        """Aplica varios (user_id, delta) a la vez y devuelve los balances nuevos.
+
+        Todos los cambios van en la misma transacción, así un
+        reparto nunca queda a medias. Los débitos no bajan de 0.
+        """
+        balances = await self._guild(guild_id)
+        new_values: Dict[int, int] = {}
+        for user_id, delta in changes:
+            current = new_values.get(user_id, balances.get(user_id, 0))
+            new_values[user_id] = max(current + delta, 0)
+        values: Dict[Tuple[int, int], int] = {}
+        ledger: List[LedgerEntry] = []
+        self._stage(guild_id, balances, new_values, kind, actor_id, note, values, ledger)
+        await self._write(values, ledger)
+        return new_values
+
+    async def transfer(self, guild_id: int, sender_id: int, receiver_id: int,
+                       amount: int) -> Optional[Tuple[int, int]]:
+        """Mueve `amount` si el emisor tiene fondos, en una sola transacción.
+
+        La comprobación y el débito ocurren sin ceder el event loop, así dos
+        transferencias concurrentes nunca gastan el mismo silver. Devuelve
+        (balance emisor, balance receptor) o None si no hay fondos suficientes.
+        """
+        balances = await self._guild(guild_id)
+        sender_balance = balances.get(sender_id, 0)
+        if amount <= 0 or sender_balance < amount:
+            return None
+        if sender_id == receiver_id:
+            return sender_balance, sender_balance
+        receiver_balance = balances.get(receiver_id, 0) + amount
+        values: Dict[Tuple[int, int], int] = {}
+        ledger: List[LedgerEntry] = []
+        self._stage(guild_id, balances, {sender_id: sender_balance - amount}, "transferir",
+                    sender_id, f"a <@{receiver_id}>", values, ledger)
+        self._stage(guild_id, balances, {receiver_id: receiver_balance}, "transferir",
+                    sender_id, f"de <@{sender_id}>", values, ledger)
+        await self._write(values, ledger)
+        return sender_balance - amount, receiver_balance
+
+    async def resolve_requests(self, guild_id: int, requests: Sequence[Tuple[int, int, int, str]], status: str,
+                               *, actor_id: Optional[int] = None) -> List[int]:
+        """Resuelve solicitudes de regear (request_id, user_id, abono, nota) con su abono.
+
+        La transacción solo acredita las solicitudes que seguían en cola en la
+        base de datos (Database.resolve_requests), así dos procesos con la misma
+        cola cargada nunca abonan dos veces. Siempre se confirma antes de
+        volver, también en modo batched. Devuelve los ids que sí se resolvieron.
+        """
+        balances = await self._guild(guild_id)
+        rows = [(request_id, guild_id, user_id, amount, note) for request_id, user_id, amount, note in requests]
+        credits = {request_id: (user_id, amount) for request_id, user_id, amount, _ in requests if amount > 0}
+        async with self._flush_lock:
+            # Lo pendiente va antes, así la base coincide con la memoria al abonar
+            await self._flush_locked()
+            # Abono optimista en memoria; se deshace para lo que la base no aplicó
+            for user_id, amount in credits.values():
+                balances[user_id] = balances.get(user_id, 0) + amount
+            write = asyncio.ensure_future(self.run(Database.resolve_requests, rows, status, "regear", actor_id))
+            write.add_done_callback(lambda f: self._settle(f, guild_id, credits))
+            return await asyncio.shield(write)
+
+    def _settle(self, write: asyncio.Future, guild_id: int, credits: Dict[int, Tuple[int, int]]):
+        """Quita de la memoria los abonos de las solicitudes que no se resolvieron."""
+        applied = set(write.result()) if not write.cancelled() and write.exception() is None else set()
+        balances = self._cache.get(guild_id, {})
+        for request_id, (user_id, amount) in credits.items():
+            if request_id in applied:
+                continue
+            if user_id in balances:
+                balances[user_id] = max(balances[user_id] - amount, 0)
+            # Cambios escritos mientras tanto ya contaban con el abono
+            if (guild_id, user_id) in self._dirty:
+                self._dirty[(guild_id, user_id)] = max(self._dirty[(guild_id, user_id)] - amount, 0)
+
+    async def history(self, guild_id: int, user_id: int, before_id: Optional[int] = None,
+                      limit: int = 10) -> List[sqlite3.Row]:
+        """Página del ledger del usuario (más reciente primero), ver Database.history."""
+        await self.flush()
+        return await self.run(Database.history, guild_id, user_id, before_id, limit)
+
+    async def top(self, guild_id: int, limit: int = 250) -> List[sqlite3.Row]:
+        await self.flush()
+        return await self.run(Database.top_balances, guild_id, limit)
+
+    async def top_page(self, guild_id: int, after: Optional[Tuple[int, int]] = None,
+                       limit: int = 10) -> List[sqlite3.Row]:
+        await self.flush()
+        return await self.run(Database.top_page, guild_id, after, limit)
+
+    async def rank(self, guild_id: int, user_id: int) -> Optional[int]:
+        await self.flush()
+        return await self.run(Database.balance_rank, guild_id, user_id)
+
+    async def forget(self, guild_id: int):
+        """Vuelca lo pendiente y descarta de memoria los balances del servidor."""
+        await self.flush()
+        self._cache.pop(guild_id, None)
+
+    async def aclose(self):
+        """Vuelca lo pendiente y cierra; llamar antes de detener el event loop."""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        await self.flush()
+        self.close()
+
+    def close(self):
+        """Espera a que terminen las consultas en curso y cierra las conexiones."""
+        self._executor.shutdown(wait=True)
+        if self._db is not None:
+            self._db.close()
@@ -0,0 +1,28 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+BOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BOT_DIR)
+
+
+@pytest.fixture
+def spawn():
+    """Lanza `python -c code` con los módulos del bot importables y lo mata al terminar el test."""
+    procs = []
+
+    def start(code: str, *args: str) -> subprocess.Popen:
+        env = dict(os.environ, PYTHONPATH=BOT_DIR, PYTHONUNBUFFERED="1")
+        proc = subprocess.Popen([sys.executable, "-c", code, *args], cwd=BOT_DIR, env=env,
+                                stdout=subprocess.PIPE, text=True)
+        procs.append(proc)
+        return proc
+
+    yield start
+    for proc in procs:
+        if proc.poll() is None:
+            proc.kill()
+        proc.wait()
+        proc.stdout.close()
@@ -0,0 +1,91 @@
+import asyncio
+import os
+import signal
+import sqlite3
+import sys
+
+import pytest
+
+from approvals import ApprovalQueue
+from db import Database
+from store import Balances
+
+GUILD_ID = 1
+ADMIN_ID = 99
+
+# Proceso hijo: encola 5, aprueba la primera y saca la segunda sin resolverla
+CHILD = """
+import asyncio, sys
+from approvals import ApprovalQueue
+from db import Database
+from store import Balances
+
+async def main():
+    store = Balances(Database(sys.argv[1]), durability="strict")
+    queue = await ApprovalQueue(store, {guild}).ready()
+    for user_id in range(1, 6):
+        await queue.push({guild}, user_id, {{1: 1}}, 1000, 10, 100 + user_id, [])
+    first, second = queue.unclaimed(2)
+    item = queue.take(first["id"], {admin})
+    await store.resolve_requests({guild}, [(item["id"], item["user_id"], item["total_value"], "regear")],
+                                 "Aprobado", actor_id={admin})
+    queue.take(second["id"], {admin})
+    print(f"ready {{item['user_id']}}", flush=True)
+    await asyncio.Event().wait()
+
+asyncio.run(main())
+""".format(guild=GUILD_ID, admin=ADMIN_ID)
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="necesita SIGKILL")
+def test_taken_request_survives_sigkill(tmp_path, spawn):
+    path = str(tmp_path / "balances.db")
+    proc = spawn(CHILD, path)
+    line = proc.stdout.readline().split()
+    assert line[0] == "ready"
+    approved = int(line[1])
+    os.kill(proc.pid, signal.SIGKILL)
+    proc.wait()
+
+    async def reload():
+        store = Balances(Database(path))
+        queue = ApprovalQueue(store, GUILD_ID)
+        await queue.load()
+        balance = await store.get(GUILD_ID, approved)
+        await store.aclose()
+        return queue, balance
+
+    queue, balance = asyncio.run(reload())
+    # La sacada sin resolver vuelve a la cola; la aprobada no
+    assert len(queue) == 4
+    assert approved not in {item["user_id"] for item in queue}
+    assert balance == 1000
+
+    conn = sqlite3.connect(path)
+    ledger = conn.execute("SELECT user_id, delta, kind FROM ledger WHERE guild_id = ?", (GUILD_ID,)).fetchall()
+    statuses = dict(conn.execute("SELECT user_id, status FROM approval_queue WHERE guild_id = ?", (GUILD_ID,)))
+    conn.close()
+    assert ledger == [(approved, 1000, "regear")]
+    assert statuses[approved] == "Aprobado"
+    assert sum(1 for status in statuses.values() if status == "En cola") == 4
+
+
+def test_put_back_restores_order_and_frees_claim(tmp_path):
+    async def scenario():
+        store = Balances(Database(str(tmp_path / "balances.db")))
+        queue = await ApprovalQueue(store, GUILD_ID).ready()
+        for user_id in range(1, 5):
+            await queue.push(GUILD_ID, user_id, {1: 1}, 1000, 10, 100 + user_id, [])
+        ids = [item["id"] for item in queue]
+        taken = queue.take_many([ids[0], ids[2]], ADMIN_ID)
+        assert [item["id"] for item in queue] == [ids[1], ids[3]]
+        queue.put_back(taken)
+        order = [item["id"] for item in queue]
+        # Sin reclamo: otro admin puede sacarla
+        retaken = queue.take(ids[0], ADMIN_ID + 1)
+        await store.aclose()
+        return ids, order, retaken
+
+    ids, order, retaken = asyncio.run(scenario())
+    assert order == ids
+    assert retaken is not None and retaken["id"] == ids[0]
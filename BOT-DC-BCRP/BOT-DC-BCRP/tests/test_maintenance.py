@@ -0,0 +1,104 @@
+import glob
+import sqlite3
+import threading
+
+import pytest
+
+from db import Database
+from maintenance import backup_to, check, restore
+
+GUILD_ID = 1
+USERS = 2000
+
+
+def total(path: str) -> int:
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT COALESCE(SUM(balance), 0) FROM balances").fetchone()[0]
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = str(tmp_path / "balances.db")
+    db = Database(path)
+    db.add_balances(GUILD_ID, [(uid, 1000) for uid in range(USERS)])
+    return path, db
+
+
+def test_backup_under_writes_then_restore(database, tmp_path):
+    path, db = database
+    stop = threading.Event()
+    writes = []
+
+    def writer():
+        # Otra conexión escribe sin parar mientras dura la copia
+        i = 0
+        while not stop.is_set():
+            db.add_balance(GUILD_ID, i % USERS, 1)
+            writes.append(i)
+            i += 1
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        snapshot = str(tmp_path / "snapshot.db")
+        backup_to(path, snapshot, pages=8, sleep=0.001)
+    finally:
+        stop.set()
+        thread.join()
+    assert writes, "el escritor no llegó a escribir durante la copia"
+    assert check(snapshot, full=True) == "ok"
+    expected = total(snapshot)
+    assert USERS * 1000 <= expected <= USERS * 1000 + len(writes)
+
+    # Más cambios después de la copia: la restauración tiene que deshacerlos
+    db.add_balance(GUILD_ID, 0, 10 ** 9)
+    live = total(path)
+    db.close()
+
+    saved = restore(snapshot, path)
+    assert total(path) == expected
+    assert check(path, full=True) == "ok"
+    assert saved is not None and glob.glob(path + ".before-restore-*") == [saved]
+    assert total(saved) == live
+
+
+def test_restore_rejects_truncated_snapshot(database, tmp_path):
+    path, db = database
+    snapshot = str(tmp_path / "snapshot.db")
+    backup_to(path, snapshot)
+    db.close()
+    with open(snapshot, "rb") as f:
+        data = f.read()
+    truncated = str(tmp_path / "truncated.db")
+    with open(truncated, "wb") as f:
+        f.write(data[:len(data) // 2])
+
+    before = total(path)
+    with pytest.raises(ValueError):
+        restore(truncated, path)
+    assert total(path) == before
+    assert glob.glob(path + ".before-restore-*") == []
+
+
+def test_backup_only_takes_final_name_after_check(database, tmp_path, monkeypatch):
+    import maintenance
+
+    path, db = database
+    target = str(tmp_path / "balances-20261018-120000.db")
+    checked = []
+
+    def failing_check(candidate, full=False):
+        checked.append(candidate)
+        return "*** in database main ***"
+
+    monkeypatch.setattr(maintenance, "check", failing_check)
+    with pytest.raises(ValueError):
+        backup_to(path, target)
+    db.close()
+    # Se revisó el .tmp; el nombre final nunca existió y la copia quedó apartada
+    assert checked == [target + ".tmp"]
+    assert not glob.glob(target) and glob.glob(target + ".bad")
+    assert maintenance.snapshots(str(tmp_path)) == []
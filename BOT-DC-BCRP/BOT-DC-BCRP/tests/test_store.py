@@ -0,0 +1,106 @@
+import asyncio
+import os
+import signal
+import sqlite3
+import sys
+from collections import defaultdict
+
+import pytest
+
+GUILD_ID = 1
+USERS = 20
+
+# Proceso hijo: abonos concurrentes en modo strict; imprime cada uno al confirmarse
+CHILD = """
+import asyncio, sys
+from db import Database
+from store import Balances
+
+async def main():
+    store = Balances(Database(sys.argv[1]), durability="strict")
+
+    async def credit(i):
+        user_id, amount = i % {users}, i + 1
+        await store.add({guild}, user_id, amount, kind="regear", note=f"op {{i}}")
+        print(f"ack {{user_id}} {{amount}}", flush=True)
+
+    i = 0
+    while True:
+        await asyncio.gather(*(credit(i + j) for j in range(25)))
+        i += 25
+
+asyncio.run(main())
+""".format(users=USERS, guild=GUILD_ID)
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="necesita SIGKILL")
+def test_strict_mode_keeps_acknowledged_credits_after_sigkill(tmp_path, spawn):
+    path = str(tmp_path / "balances.db")
+    proc = spawn(CHILD, path)
+    acked = []
+    for line in proc.stdout:
+        _, user_id, amount = line.split()
+        acked.append((int(user_id), int(amount)))
+        if len(acked) >= 500:
+            break
+    os.kill(proc.pid, signal.SIGKILL)
+    proc.wait()
+    # Lo que ya estaba escrito en la tubería también fue confirmado
+    for line in proc.stdout:
+        parts = line.split()
+        if len(parts) == 3:
+            acked.append((int(parts[1]), int(parts[2])))
+
+    conn = sqlite3.connect(path)
+    balances = dict(conn.execute("SELECT user_id, balance FROM balances WHERE guild_id = ?", (GUILD_ID,)))
+    ledger = set(conn.execute("SELECT user_id, delta FROM ledger WHERE guild_id = ? AND kind = 'regear'",
+                              (GUILD_ID,)))
+    ledger_totals = dict(conn.execute("SELECT user_id, SUM(delta) FROM ledger WHERE guild_id = ? GROUP BY user_id",
+                                      (GUILD_ID,)))
+    conn.close()
+
+    expected = defaultdict(int)
+    for user_id, amount in acked:
+        expected[user_id] += amount
+        # Los importes son únicos, así cada abono confirmado tiene su propia fila
+        assert (user_id, amount) in ledger
+    for user_id, amount in expected.items():
+        assert balances.get(user_id, 0) >= amount
+    # Y nada llegó a balances sin su fila de ledger
+    assert balances == ledger_totals
+
+
+def test_strict_mode_failed_write_changes_nothing(tmp_path, monkeypatch):
+    from db import Database
+    from store import Balances
+
+    write_balances = Database.write_balances
+    failures = [sqlite3.OperationalError("disk I/O error")]
+
+    def flaky(db, *args):
+        if failures:
+            raise failures.pop()
+        return write_balances(db, *args)
+
+    async def scenario():
+        store = Balances(Database(str(tmp_path / "balances.db")), durability="strict")
+        await store.set(GUILD_ID, 1, 100)
+        monkeypatch.setattr(Database, "write_balances", flaky)
+        with pytest.raises(sqlite3.OperationalError):
+            await store.transfer(GUILD_ID, 1, 2, 60)
+        seen = await store.get(GUILD_ID, 1), await store.get(GUILD_ID, 2)
+        # El reintento del usuario funciona y solo se aplica una vez
+        retried = await store.transfer(GUILD_ID, 1, 2, 60)
+        await store.aclose()
+        return seen, retried
+
+    seen, retried = asyncio.run(scenario())
+    assert seen == (100, 0)
+    assert retried == (40, 60)
+
+    conn = sqlite3.connect(str(tmp_path / "balances.db"))
+    balances = dict(conn.execute("SELECT user_id, balance FROM balances WHERE guild_id = ?", (GUILD_ID,)))
+    transfers = conn.execute("SELECT COUNT(*) FROM ledger WHERE kind = 'transferir'").fetchone()[0]
+    conn.close()
+    assert balances == {1: 40, 2: 60}
+    assert transfers == 2